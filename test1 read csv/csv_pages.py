@@ -0,0 +1,149 @@
+"""
+Byte-offset page index for a CSV file
+=====================================
+
+Lets a program show page N of a big CSV without reading pages 1..N-1:
+one streaming pass remembers the byte offset where every page starts (and
+the id on that page's first row), then any page is a seek + PAGE_SIZE rows.
+
+    pages = PageIndex("users.csv", page_size=20)
+    pages.refresh()                      # (re)builds only if the CSV changed
+    for offset, row in pages.rows(pages.offsets[7]):
+        ...                              # rows of page 7 onwards, streamed
+    pages.page_for_id(1234)              # which page holds id 1234
+
+The index is small (one offset per page, not per row) and is saved next to
+the CSV (users.csv.pages) together with the CSV's inode/mtime/size, so a
+new run only rebuilds it after the file was rewritten.
+Rows are parsed with the csv module, so quoted commas/newlines are fine.
+"""
+
+import bisect
+import csv
+import json
+import locale
+import os
+import tempfile
+
+ENCODING = locale.getpreferredencoding(False)  # what open() uses for the CSV
+
+
+class PageIndex:
+    """Offsets of every page start in a CSV with an integer "id" column."""
+
+    def __init__(self, path, page_size=20, index_path=None):
+        self.path = path
+        self.page_size = page_size
+        self.index_path = index_path or path + ".pages"
+        self.signature = None
+        self.fieldnames = []
+        self.offsets = []  # byte offset of the first row of each page
+        self.first_ids = []  # id on the first row of each page
+        self.ids_sorted = True  # ids increase through the file -> page_for_id can bisect
+        self.max_id = 0
+        self.rows_total = 0
+        self.size = 0  # bytes in the CSV when the index was built
+
+    def _file_signature(self):
+        stat = os.stat(self.path)
+        return [stat.st_ino, stat.st_mtime_ns, stat.st_size]
+
+    def refresh(self):
+        """Load the saved index, or rebuild it if the CSV changed since."""
+        signature = self._file_signature()
+        if signature == self.signature:
+            return
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as file:
+                saved = json.load(file)
+            if saved["signature"] == signature and saved["page_size"] == self.page_size:
+                self.__dict__.update(saved)
+                return
+        except (FileNotFoundError, ValueError, KeyError):
+            pass
+        self._build(signature)
+
+    def _build(self, signature):
+        self.offsets, self.first_ids = [], []
+        self.ids_sorted, self.max_id, self.rows_total = True, 0, 0
+        previous_id = None
+        for offset, row in self.rows():
+            user_id = int(row["id"]) if str(row.get("id", "")).isdigit() else 0
+            if self.rows_total % self.page_size == 0:
+                self.offsets.append(offset)
+                self.first_ids.append(user_id)
+            if previous_id is not None and user_id <= previous_id:
+                self.ids_sorted = False
+            previous_id = user_id
+            self.max_id = max(self.max_id, user_id)
+            self.rows_total += 1
+        self.signature = signature
+        self.size = signature[-1]
+
+        saved = {key: getattr(self, key) for key in (
+            "signature", "page_size", "fieldnames", "offsets", "first_ids",
+            "ids_sorted", "max_id", "rows_total", "size")}
+        # a temp name of our own: another process may be rebuilding the index too
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.index_path)),
+                                        prefix=os.path.basename(self.index_path) + ".")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as file:
+                json.dump(saved, file)
+            os.chmod(tmp_path, 0o644)  # mkstemp makes it owner-only
+            os.replace(tmp_path, self.index_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    @property
+    def page_count(self):
+        return len(self.offsets)
+
+    def rows(self, offset=None):
+        """Yield (byte offset, row dict) for every row from `offset` (default: the first row)."""
+        with open(self.path, "rb") as file:
+            header = file.readline()  # our header never spans lines
+            self.fieldnames = next(csv.reader([header.decode(ENCODING)]), [])
+            for start, values in _records(file, max(offset or 0, len(header))):
+                if values:  # skip blank lines
+                    yield start, dict(zip(self.fieldnames, values))
+
+    def page_for_id(self, user_id):
+        """Page number holding `user_id`, or None if it isn't in the CSV."""
+        if self.ids_sorted:
+            page = bisect.bisect_right(self.first_ids, user_id) - 1
+            if page < 0 or user_id > self.max_id:
+                return None
+            # confirm it is really there (ids can have gaps)
+            stop = self.offsets[page + 1] if page + 1 < self.page_count else None
+            for start, row in self.rows(self.offsets[page]):
+                if stop is not None and start >= stop:
+                    break
+                if row.get("id") == str(user_id):
+                    return page
+            return None
+        for start, row in self.rows():  # unsorted file: one streaming scan
+            if row.get("id") == str(user_id):
+                return bisect.bisect_right(self.offsets, start) - 1
+        return None
+
+
+def _records(file, offset):
+    """
+    Yield (byte offset where the record starts, list of values) from `offset`.
+    Offsets are counted on the raw lines handed to csv.reader, which only
+    reads as many lines as the current record needs.
+    """
+    file.seek(offset)
+    position = offset
+
+    def lines():
+        nonlocal position
+        for line in file:
+            position += len(line)
+            yield line.decode(ENCODING)
+
+    start = offset
+    for values in csv.reader(lines()):
+        yield start, values
+        start = position
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Stress test: many processes writing the same CSV user store at once
+===================================================================
+
+Starts N worker processes that all hammer one users.csv in a temporary
+folder, then checks that no write was lost.
+
+- read_user_csv (default): each worker mixes
+    * counter bumps on shared users (UserRepository.update: read, +1, write;
+      retried on VersionConflict),
+    * new users (ids from the shared IdSequence),
+    * bulk grant/revoke of a game for a few users (change_games),
+  with a small journal so compactions happen while others are writing.
+  Checked afterwards: every counter equals the number of bumps made, every
+  version equals 1 + the number of changes, and every new id exists once.
+- read_user: workers call edit_user() / add_user() on read_user.csv.
+  Checked afterwards: versions add up to the number of edits, ids are unique.
+
+How to run
+----------
+    python csv_stress_test.py
+    python csv_stress_test.py --procs 16 --ops 500 --users 20
+    python csv_stress_test.py --target read_user
+
+Exits with status 1 if anything was lost.
+"""
+
+import argparse
+import contextlib
+import csv
+import io
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import read_user
+import read_user_csv
+from id_sequence import IdSequence
+
+
+def open_store(path, compact_after):
+    """A UserRepository + IdSequence on `path`, sharing one lock like the real app."""
+    repo = read_user_csv.UserRepository(path, compact_after=compact_after)
+    sequence = IdSequence(path + ".seq", recover=repo.max_id, lock=repo.lock)
+    return repo, sequence
+
+
+def _bump(row):
+    row["verify_otp"] = str(int(row["verify_otp"]) + 1)
+
+
+def csv_worker(job):
+    """One process: `ops` random operations against the shared users.csv."""
+    path, worker, ops, user_ids, compact_after, seed = job
+    repo, sequence = open_store(path, compact_after)
+    rng = random.Random(seed)
+    bumps, added, games_changes = Counter(), [], 0
+    for i in range(ops):
+        roll = rng.random()
+        if roll < 0.7:
+            user_id = rng.choice(user_ids)
+            repo.update(user_id, _bump)
+            bumps[user_id] += 1
+        elif roll < 0.9:
+            user_id = sequence.next_id()
+            repo.upsert({"id": user_id, "name": f"W{worker}-{i}", "verify_otp": "0",
+                         "timestamp": "", "game_mask": read_user_csv.ALL_GAMES_MASK})
+            added.append(user_id)
+        else:
+            bit = rng.choice(list(read_user_csv.GAME_BITS.values()))
+            sample = rng.sample(user_ids, min(5, len(user_ids)))
+            grant = rng.random() < 0.5
+            games_changes += repo.change_games(sample, grant=bit if grant else 0, revoke=0 if grant else bit)
+    return {"bumps": bumps, "added": added, "games_changes": games_changes, "conflicts": repo.conflicts}
+
+
+def run_csv(args, tmp_dir):
+    path = os.path.join(tmp_dir, "users.csv")
+    with open(path, "w", newline="") as file:
+        csv.DictWriter(file, fieldnames=read_user_csv.FIELDS).writeheader()
+    repo, sequence = open_store(path, args.compact_after)
+    user_ids = list(sequence.reserve(args.users))
+    repo.upsert_many({"id": user_id, "name": f"User{user_id}", "verify_otp": "0", "timestamp": "",
+                      "game_mask": read_user_csv.ALL_GAMES_MASK} for user_id in user_ids)
+
+    jobs = [(path, w, args.ops, user_ids, args.compact_after, args.seed + w) for w in range(args.procs)]
+    start = time.perf_counter()
+    with multiprocessing.get_context("spawn").Pool(args.procs) as pool:
+        results = pool.map(csv_worker, jobs)
+    elapsed = time.perf_counter() - start
+
+    bumps = sum((r["bumps"] for r in results), Counter())
+    added = [user_id for r in results for user_id in r["added"]]
+    games_changes = sum(r["games_changes"] for r in results)
+    conflicts = sum(r["conflicts"] for r in results)
+
+    final = read_user_csv.UserRepository(path)
+    rows = {int(row["id"]): row for row in final.all_rows()}
+    problems = []
+    for user_id in user_ids:
+        row = rows.get(user_id)
+        if row is None:
+            problems.append(f"user {user_id} disappeared")
+            continue
+        if int(row["verify_otp"]) != bumps[user_id]:
+            problems.append(f"user {user_id}: counter {row['verify_otp']}, expected {bumps[user_id]}")
+    # seeded rows start at version 1; each bump or game change adds one
+    total_versions = sum(read_user_csv.row_version(rows[u]) - 1 for u in user_ids if u in rows)
+    if total_versions != sum(bumps.values()) + games_changes:
+        problems.append(f"versions add up to {total_versions}, expected {sum(bumps.values()) + games_changes}")
+    if len(set(added)) != len(added):
+        problems.append(f"{len(added) - len(set(added))} duplicate new ids")
+    missing = [user_id for user_id in added if user_id not in rows]
+    if missing:
+        problems.append(f"{len(missing)} new users lost, e.g. {missing[:5]}")
+    if len(rows) != len(user_ids) + len(set(added)):
+        problems.append(f"{len(rows)} rows, expected {len(user_ids) + len(set(added))}")
+
+    writes = sum(bumps.values()) + len(added) + games_changes
+    print(f"\nread_user_csv: {args.procs} processes x {args.ops} ops in {elapsed:.2f}s")
+    print(f"  counter bumps : {sum(bumps.values())}")
+    print(f"  users added   : {len(added)}")
+    print(f"  game changes  : {games_changes}")
+    print(f"  retried after a version conflict: {conflicts}")
+    print(f"  writes/sec    : {writes / elapsed:,.0f}")
+    return problems
+
+
+def read_user_worker(job):
+    """One process: edit_user() / add_user() against the shared read_user.csv."""
+    path, worker, ops, user_ids, seed = job
+    read_user.FILENAME = path
+    read_user.lock = read_user.FileLock(path + ".lock")
+    read_user.id_sequence = IdSequence(path + ".seq", recover=read_user.highest_id, lock=read_user.lock)
+    rng = random.Random(seed)
+    edits, added = Counter(), []
+    with contextlib.redirect_stdout(io.StringIO()):  # the functions print a line per call
+        for i in range(ops):
+            if rng.random() < 0.8:
+                user_id = rng.choice(user_ids)
+                read_user.edit_user(user_id, new_name=f"W{worker}-{i}")
+                edits[user_id] += 1
+            else:
+                added += read_user.add_users([(f"W{worker}-{i}", f"w{worker}-{i}@example.com")])
+    return {"edits": edits, "added": added}
+
+
+def run_read_user(args, tmp_dir):
+    path = os.path.join(tmp_dir, "read_user.csv")
+    read_user.FILENAME = path
+    read_user.lock = read_user.FileLock(path + ".lock")
+    read_user.id_sequence = IdSequence(path + ".seq", recover=read_user.highest_id, lock=read_user.lock)
+    read_user.init_file()
+    user_ids = read_user.add_users([(f"User{i}", f"user{i}@example.com") for i in range(args.users)])
+
+    jobs = [(path, w, args.ops, user_ids, args.seed + w) for w in range(args.procs)]
+    start = time.perf_counter()
+    with multiprocessing.get_context("spawn").Pool(args.procs) as pool:
+        results = pool.map(read_user_worker, jobs)
+    elapsed = time.perf_counter() - start
+
+    edits = sum((r["edits"] for r in results), Counter())
+    added = [user_id for r in results for user_id in r["added"]]
+    with open(path, newline="") as file:
+        rows = {int(row["id"]): row for row in csv.DictReader(file)}
+    problems = []
+    for user_id in user_ids:
+        version = int(rows[user_id]["version"]) if user_id in rows else None
+        if version != 1 + edits[user_id]:
+            problems.append(f"user {user_id}: version {version}, expected {1 + edits[user_id]}")
+    if len(set(added)) != len(added) or any(user_id not in rows for user_id in added):
+        problems.append("new users were lost or got duplicate ids")
+
+    print(f"\nread_user: {args.procs} processes x {args.ops} ops in {elapsed:.2f}s")
+    print(f"  edits         : {sum(edits.values())}")
+    print(f"  users added   : {len(added)}")
+    print(f"  writes/sec    : {(sum(edits.values()) + len(added)) / elapsed:,.0f}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run many writer processes against one CSV user store.")
+    parser.add_argument("--target", choices=("read_user_csv", "read_user"), default="read_user_csv")
+    parser.add_argument("--procs", type=int, default=8, help="writer processes")
+    parser.add_argument("--ops", type=int, default=200, help="operations per process")
+    parser.add_argument("--users", type=int, default=20,
+                        help="shared users every process updates (fewer = more conflicts)")
+    parser.add_argument("--compact-after", type=int, default=50,
+                        help="journal records before compaction (small = compactions during the run)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        run = run_csv if args.target == "read_user_csv" else run_read_user
+        problems = run(args, tmp_dir)
+
+    if problems:
+        print("\n❌ Lost or conflicting writes:")
+        for problem in problems[:20]:
+            print("  -", problem)
+        sys.exit(1)
+    print("\n✅ No writes lost.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Advisory file lock shared by every process using the same data file
+===================================================================
+
+    lock = FileLock("users.csv.lock")
+    with lock.shared():       # readers: many at once
+        ...
+    with lock.exclusive():    # writers: one at a time, no readers meanwhile
+        ...
+
+- Uses fcntl.flock on a separate .lock file, so the data file itself can
+  still be replaced with os.replace() while the lock is held.
+- Re-entrant: code that already holds the lock can call functions that
+  take it again. A shared lock can't be upgraded to an exclusive one
+  (two readers doing that would deadlock), so take exclusive() first.
+- Threads of one process take turns; a child process (fork) opens its own
+  lock file instead of sharing the parent's lock.
+- Without fcntl (Windows) only threads are kept apart.
+
+VersionConflict is what writers raise when optimistic concurrency loses:
+the row they read was changed by someone else before they wrote it back.
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+SHARED = "shared"
+EXCLUSIVE = "exclusive"
+
+
+class VersionConflict(Exception):
+    """A row changed (or was deleted) since it was read; re-read it and try again."""
+
+    def __init__(self, row_id, expected, found):
+        super().__init__(f"row {row_id}: read at version {expected}, now at version {found}")
+        self.row_id = row_id
+        self.expected = expected
+        self.found = found
+
+
+class FileLock:
+    """Re-entrant shared/exclusive flock() on `path`."""
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+        self._pid = None
+        self._mode = None
+        self._depth = 0
+        self._thread_lock = threading.RLock()
+
+    def _lock_fd(self):
+        if self._fd is None or self._pid != os.getpid():
+            # after fork the inherited fd would share the parent's lock: open our own
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            self._pid = os.getpid()
+        return self._fd
+
+    @contextmanager
+    def _hold(self, mode):
+        with self._thread_lock:
+            if self._depth == 0:
+                if fcntl is not None:
+                    fcntl.flock(self._lock_fd(), fcntl.LOCK_EX if mode == EXCLUSIVE else fcntl.LOCK_SH)
+                self._mode = mode
+            elif mode == EXCLUSIVE and self._mode == SHARED:
+                raise RuntimeError(f"{self.path}: can't upgrade a shared lock to exclusive")
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._mode = None
+                    if fcntl is not None:
+                        fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def shared(self):
+        return self._hold(SHARED)
+
+    def exclusive(self):
+        return self._hold(EXCLUSIVE)
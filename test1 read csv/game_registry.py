@@ -0,0 +1,90 @@
+"""
+Game registry for the read_user_csv game menu
+=============================================
+
+Games are listed in a manifest (games.json next to this file) instead of
+being imported and hard-coded in the menu:
+
+    {"games": [{"code": "2", "bit": 1, "label": "RPS Game",
+                "menu_label": "RPS Game (rock-paper-scissors)",
+                "module": "RPS2", "function": "rps"}, ...]}
+
+- "code" is what the user types in the menu.
+- "bit" is the game's bit in a user's game_mask. It is stored in users.csv,
+  so never change or reuse it; give a new game the next free bit.
+- "module"/"function" say what to run. The module is only imported the first
+  time someone launches that game, so reading the manifest at start-up costs
+  the same whether it lists three games or fifty.
+
+Adding a game = drop its .py file in this folder and add one manifest entry.
+"""
+
+import importlib
+import json
+import os
+
+MANIFEST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "games.json")
+
+
+class Game:
+    """One manifest entry; launch() imports the module on first use."""
+
+    __slots__ = ("code", "bit", "label", "menu_label", "module", "function", "_play")
+
+    def __init__(self, code, bit, label, module, function, menu_label=None):
+        self.code = str(code)
+        self.bit = int(bit)
+        self.label = label
+        self.menu_label = menu_label or label
+        self.module = module
+        self.function = function
+        self._play = None
+
+    @property
+    def loaded(self):
+        return self._play is not None
+
+    def launch(self):
+        if self._play is None:
+            self._play = getattr(importlib.import_module(self.module), self.function)
+        return self._play()
+
+
+class GameRegistry:
+    """Games from the manifest, in manifest order, looked up by code."""
+
+    def __init__(self, manifest_path=MANIFEST_PATH):
+        self.manifest_path = manifest_path
+        with open(manifest_path, "r", encoding="utf-8") as file:
+            entries = json.load(file)["games"]
+        self._games = {}
+        self._by_bit = {}
+        for entry in entries:
+            game = Game(**entry)
+            if game.code in self._games:
+                raise ValueError(f"{manifest_path}: game code {game.code!r} listed twice")
+            if game.bit in self._by_bit:
+                raise ValueError(f"{manifest_path}: bit {game.bit} used by two games")
+            self._by_bit[game.bit] = game
+            self._games[game.code] = game
+
+    def __iter__(self):
+        return iter(self._games.values())
+
+    def __len__(self):
+        return len(self._games)
+
+    def get(self, code):
+        return self._games.get(str(code))
+
+    def by_bit(self, bit):
+        """The game stored as `bit` in masks and logs (None if it was removed)."""
+        return self._by_bit.get(bit)
+
+    def labels(self):
+        """code -> label, in manifest order."""
+        return {game.code: game.label for game in self}
+
+    def bits(self):
+        """code -> bitmask value (1 << bit)."""
+        return {game.code: 1 << game.bit for game in self}
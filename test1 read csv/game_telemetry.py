@@ -0,0 +1,126 @@
+"""
+Game session telemetry
+======================
+
+Every game played from the menu is appended to a binary log as one
+fixed-size record (23 bytes):
+
+    user id (uint32) | game bit (uint16) | outcome (uint8) | start, end (float64 unix time)
+
+The game is stored by its bit from games.json, which never changes, so
+old records stay valid when games are added or relabelled.
+
+Totals are kept in a small rollup file next to the log, together with how
+many bytes of the log they already include. stats() only reads the records
+appended since the last call, folds them in and saves the rollup again, so
+asking for stats never rescans the whole log.
+
+    telemetry = GameTelemetry("game_sessions.log")
+    telemetry.record(user_id=7, game_bit=1, start=t0, end=t1, outcome=FINISHED)
+    telemetry.stats()   # {"games": {bit: {...}}, "users": {id: {bit: {...}}}}
+"""
+
+import json
+import os
+import struct
+import tempfile
+
+RECORD = struct.Struct("<IHBdd")
+
+FINISHED = 0  # the game returned normally
+QUIT = 1  # Ctrl+C / end of input while playing
+ERROR = 2  # the game raised an exception
+OUTCOMES = ("finished", "quit", "error")
+
+
+def _empty_totals():
+    return {"plays": 0, "seconds": 0.0, "outcomes": [0] * len(OUTCOMES), "last_played": 0.0}
+
+
+def _add(totals, outcome, start, end):
+    totals["plays"] += 1
+    totals["seconds"] += max(0.0, end - start)
+    totals["outcomes"][outcome] += 1
+    totals["last_played"] = max(totals["last_played"], end)
+
+
+class GameTelemetry:
+    """Append-only session log plus incrementally updated per-user / per-game totals."""
+
+    def __init__(self, log_path, rollup_path=None):
+        self.log_path = log_path
+        self.rollup_path = rollup_path or log_path + ".rollup"
+        self._rollup = None
+
+    def record(self, user_id, game_bit, start, end, outcome=FINISHED):
+        """Append one session. A single write, so concurrent players don't interleave."""
+        data = RECORD.pack(int(user_id), int(game_bit), int(outcome), float(start), float(end))
+        fd = os.open(self.log_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+
+    def _load_rollup(self):
+        try:
+            with open(self.rollup_path, "r", encoding="utf-8") as file:
+                saved = json.load(file)
+        except (FileNotFoundError, ValueError):
+            saved = {"offset": 0, "games": {}, "users": {}}
+        # JSON keys are strings; turn them back into ints
+        return {
+            "offset": saved["offset"],
+            "games": {int(bit): totals for bit, totals in saved["games"].items()},
+            "users": {
+                int(user_id): {int(bit): totals for bit, totals in per_game.items()}
+                for user_id, per_game in saved["users"].items()
+            },
+        }
+
+    def _save_rollup(self):
+        # a temp name of our own: other processes may be saving their rollup right now
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.rollup_path)),
+                                        prefix=os.path.basename(self.rollup_path) + ".")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as file:
+                file.write(json.dumps(self._rollup))
+            os.chmod(tmp_path, 0o644)  # mkstemp makes it owner-only
+            os.replace(tmp_path, self.rollup_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def stats(self):
+        """Totals per game and per user, brought up to date with new log records only."""
+        if self._rollup is None:
+            self._rollup = self._load_rollup()
+        rollup = self._rollup
+        try:
+            size = os.path.getsize(self.log_path)
+        except FileNotFoundError:
+            size = 0
+        if size < rollup["offset"]:  # log was deleted or replaced: start over
+            self._rollup = rollup = {"offset": 0, "games": {}, "users": {}}
+
+        # only whole records; one still being written is picked up next time
+        whole = (size - rollup["offset"]) // RECORD.size * RECORD.size
+        if whole:
+            with open(self.log_path, "rb") as file:
+                file.seek(rollup["offset"])
+                data = file.read(whole)
+            for user_id, game_bit, outcome, start, end in RECORD.iter_unpack(data):
+                outcome = outcome if outcome < len(OUTCOMES) else ERROR
+                _add(rollup["games"].setdefault(game_bit, _empty_totals()), outcome, start, end)
+                per_user = rollup["users"].setdefault(user_id, {})
+                _add(per_user.setdefault(game_bit, _empty_totals()), outcome, start, end)
+            rollup["offset"] += whole
+            self._save_rollup()
+        return rollup
+
+    def game_stats(self):
+        """game bit -> totals"""
+        return self.stats()["games"]
+
+    def user_stats(self, user_id):
+        """game bit -> totals for one user ({} if they never played)"""
+        return self.stats()["users"].get(int(user_id), {})
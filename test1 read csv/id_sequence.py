@@ -0,0 +1,73 @@
+"""
+Persistent ID sequence for the CSV user scripts
+===============================================
+
+Instead of reading every row and taking max(id) + 1 on every insert, the
+next free id is kept in a tiny sidecar file next to the CSV (users.csv.seq).
+
+    seq = IdSequence("users.csv.seq", recover=lambda: highest_id_in_csv())
+    user_id = seq.next_id()      # one id
+    ids = seq.reserve(500)       # a block of ids for a batch insert
+
+- The sidecar is updated (temp file + rename, flushed to disk) BEFORE the
+  ids are handed out, so a crash can only leave a gap, never a duplicate.
+- If the sidecar is missing or unreadable, the next id is recovered from the
+  data with `recover()` (the highest id in use). The first allocation in
+  each program run also checks against it, so a stale sidecar can't hand
+  out an id that is already taken.
+- Ids of deleted users are never reused.
+- Pass `lock` (a file_lock.FileLock) when several processes share the file:
+  reserve() then reads and bumps the sidecar while holding it exclusively.
+"""
+
+import os
+
+
+class IdSequence:
+    """Hands out increasing integer ids, remembered in a sidecar file."""
+
+    def __init__(self, path, recover, lock=None):
+        self.path = path
+        self.recover = recover  # () -> highest id currently used (0 if none)
+        self.lock = lock
+        self._checked = False
+
+    def _read(self):
+        try:
+            with open(self.path, "r") as file:
+                return int(file.read().strip())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _write(self, next_id):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as file:
+            file.write(f"{next_id}\n")
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.path)
+
+    def peek(self):
+        """The id the next allocation would start at (nothing is reserved)."""
+        next_id = self._read()
+        if next_id is None or not self._checked:
+            next_id = max(next_id or 1, self.recover() + 1)
+        return next_id
+
+    def reserve(self, count):
+        """Reserve `count` consecutive ids and return them as a range."""
+        if count < 1:
+            return range(0)
+        if self.lock is None:
+            return self._reserve(count)
+        with self.lock.exclusive():
+            return self._reserve(count)
+
+    def _reserve(self, count):
+        start = self.peek()
+        self._write(start + count)
+        self._checked = True
+        return range(start, start + count)
+
+    def next_id(self):
+        return self.reserve(1)[0]
@@ -0,0 +1,141 @@
+"""
+One-time codes (OTP) kept in memory
+===================================
+
+Issues verification codes with the `secrets` module and keeps, per user
+key, the code, how many tries are left and when it expires.
+
+    store = OtpStore(ttl=120, attempts=3)
+    code = store.issue(user_id)                 # "send" this to the user
+    store.check(user_id, entered)               # "ok" / "wrong" / "expired" / "locked" / "unknown"
+    await store.verify(user_id, entered)        # same, from asyncio code
+
+Expired codes are removed through a min-heap ordered by expiry time: the
+sweeper only ever looks at the soonest-expiring entry, so cleaning up is
+O(log n) per code no matter how many are pending. sweep() also runs on
+every issue(); asyncio programs can run `store.run_sweeper()` as a task.
+Nothing blocks and no thread is used per user, so one event loop can serve
+thousands of pending verifications at once.
+
+Run this file to see that:  python otp_store.py 10000
+"""
+
+import asyncio
+import heapq
+import hmac
+import secrets
+import string
+import sys
+import threading
+import time
+
+OK = "ok"
+WRONG = "wrong"
+EXPIRED = "expired"
+LOCKED = "locked"  # no tries left
+UNKNOWN = "unknown"  # nothing issued (or already used)
+
+
+class OtpStore:
+    """In-memory OTP codes with attempt limits and heap-based TTL expiry."""
+
+    def __init__(self, ttl=120, attempts=3, length=4, alphabet=string.digits):
+        self.ttl = ttl
+        self.attempts = attempts
+        self.length = length
+        self.alphabet = alphabet
+        self._codes = {}  # key -> [code, tries_left, expires_at, generation]
+        self._expiry_heap = []  # (expires_at, generation, key)
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def issue(self, key, length=None):
+        """Create (or replace) the code for `key` and return it (`length` overrides the store's)."""
+        code = "".join(secrets.choice(self.alphabet) for _ in range(length or self.length))
+        now = time.monotonic()
+        with self._lock:
+            self._sweep(now)
+            self._generation += 1
+            expires_at = now + self.ttl
+            self._codes[key] = [code, self.attempts, expires_at, self._generation]
+            heapq.heappush(self._expiry_heap, (expires_at, self._generation, key))
+        return code
+
+    def check(self, key, entered):
+        """Check one attempt. A correct code can only be used once."""
+        with self._lock:
+            entry = self._codes.get(key)
+            if entry is None:
+                return UNKNOWN
+            code, tries_left, expires_at, _ = entry
+            if time.monotonic() >= expires_at:
+                del self._codes[key]
+                return EXPIRED
+            if hmac.compare_digest(code.encode(), str(entered).strip().encode()):
+                del self._codes[key]
+                return OK
+            entry[1] = tries_left - 1
+            if entry[1] <= 0:
+                del self._codes[key]
+                return LOCKED
+            return WRONG
+
+    def tries_left(self, key):
+        with self._lock:
+            entry = self._codes.get(key)
+            return entry[1] if entry else 0
+
+    def pending(self):
+        """How many codes are waiting to be used."""
+        return len(self._codes)
+
+    def sweep(self):
+        """Drop every expired code; returns how many were removed."""
+        with self._lock:
+            return self._sweep(time.monotonic())
+
+    def _sweep(self, now):
+        removed = 0
+        heap = self._expiry_heap
+        while heap and heap[0][0] <= now:
+            _, generation, key = heapq.heappop(heap)
+            entry = self._codes.get(key)
+            # Skip heap entries for codes that were replaced or already used.
+            if entry is not None and entry[3] == generation:
+                del self._codes[key]
+                removed += 1
+        return removed
+
+    async def verify(self, key, entered):
+        """asyncio version of check(): never blocks the event loop."""
+        return self.check(key, entered)
+
+    async def run_sweeper(self, interval=1.0):
+        """Run as an asyncio task to expire codes in the background."""
+        while True:
+            self.sweep()
+            await asyncio.sleep(interval)
+
+
+async def _demo(count):
+    """Issue `count` codes and verify them all concurrently from one event loop."""
+    store = OtpStore(ttl=5, attempts=3)
+    sweeper = asyncio.create_task(store.run_sweeper(0.5))
+    codes = {user: store.issue(user) for user in range(count)}
+
+    async def user_session(user):
+        await asyncio.sleep(secrets.randbelow(1000) / 1000)  # people type at different speeds
+        if user % 10 == 0:
+            await store.verify(user, "wrong")  # some mistype once
+        return await store.verify(user, codes[user])
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(user_session(user) for user in range(count)))
+    elapsed = time.perf_counter() - start
+    sweeper.cancel()
+    print(f"{results.count(OK)}/{count} verified concurrently in {elapsed:.2f}s "
+          f"({store.pending()} codes still pending)")
+
+
+if __name__ == "__main__":
+    asyncio.run(_demo(int(sys.argv[1]) if len(sys.argv) > 1 else 10000))
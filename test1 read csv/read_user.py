@@ -1,69 +1,113 @@
-check if file exists
+import csv, os
+from id_sequence import IdSequence
+from file_lock import FileLock, VersionConflict
+
+FILENAME = "test1 read csv/read_user.csv"
+FIELDS = ["id", "name", "email", "version"]  # version goes up by one on every edit
+
+# every read holds this shared and every change exclusive, so two copies of
+# this script can't overwrite each other's edits
+lock = FileLock(FILENAME + ".lock")
+
+# check if file exists
 def init_file():
-    """Create the CSV file if it doesn’t exist, with headers."""
-    if not os.path.exists(FILENAME):
-        with open(FILENAME, mode="w", newline="") as file:
-            writer = csv.DictWriter(file, fieldnames=FIELDS)
-            writer.writeheader()
+    """Create the CSV file if it doesn’t exist, with headers (adds the version column to old files)."""
+    with lock.exclusive():
+        if not os.path.exists(FILENAME):
+            with open(FILENAME, mode="w", newline="") as file:
+                writer = csv.DictWriter(file, fieldnames=FIELDS)
+                writer.writeheader()
+            return
+        with open(FILENAME, mode="r") as file:
+            reader = csv.DictReader(file)
+            if "version" in (reader.fieldnames or []):
+                return
+            rows = [dict(row, version="1") for row in reader]
+        write_rows(rows)
+
+def write_rows(rows):
+    """Replace the CSV with rows (temp file + rename). Hold lock.exclusive() around read + write."""
+    tmp_path = FILENAME + ".tmp"
+    with open(tmp_path, mode="w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp_path, FILENAME)
 
 # ID generator
-def get_next_id():
-    """Get the next available ID (auto-increment)."""
+def highest_id():
+    """Scan the CSV for the largest id (only needed when the .seq file is lost)."""
     try:
-        with open(FILENAME, mode="r") as file:
+        with lock.shared(), open(FILENAME, mode="r") as file:
             reader = csv.DictReader(file)
             ids = [int(row["id"]) for row in reader]
-            return max(ids) + 1 if ids else 1
+            return max(ids) if ids else 0
     except FileNotFoundError:
-        return 1
+        return 0
+
+id_sequence = IdSequence(FILENAME + ".seq", recover=highest_id, lock=lock)
+
+def get_next_id():
+    """Get the next available ID (auto-increment)."""
+    return id_sequence.next_id()
 
 # adds a new user
 def add_user(name, email):
     """Add a new user with auto-generated ID."""
     user_id = get_next_id()
-    with open(FILENAME, mode="a", newline="") as file:
+    with lock.exclusive(), open(FILENAME, mode="a", newline="") as file:
         writer = csv.DictWriter(file, fieldnames=FIELDS)
-        writer.writerow({"id": user_id, "name": name, "email": email})
+        writer.writerow({"id": user_id, "name": name, "email": email, "version": 1})
     print(f"User added: {user_id}, {name}, {email}")
 
+# adds many users with one block of ids and one file append
+def add_users(users):
+    """Add (name, email) pairs; returns the new ids."""
+    ids = id_sequence.reserve(len(users))
+    with lock.exclusive(), open(FILENAME, mode="a", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=FIELDS)
+        writer.writerows({"id": user_id, "name": name, "email": email, "version": 1}
+                         for user_id, (name, email) in zip(ids, users))
+    return list(ids)
+
 # listing users
 def list_users():
     """Display all users."""
-    with open(FILENAME, mode="r") as file:
+    with lock.shared(), open(FILENAME, mode="r") as file:
         reader = csv.DictReader(file)
         for row in reader:
             print(row)
 
 # edit user details
-def edit_user(user_id, new_name=None, new_email=None):
-    """Edit a user’s name/email by ID."""
+def edit_user(user_id, new_name=None, new_email=None, expected_version=None):
+    """
+    Edit a user’s name/email by ID. Pass expected_version (the "version" you
+    read) to get VersionConflict instead of overwriting someone else's edit.
+    """
     rows = []
-    with open(FILENAME, mode="r") as file:
-        reader = csv.DictReader(file)
-        for row in reader:
-            if row["id"] == str(user_id):
-                if new_name:
-                    row["name"] = new_name
-                if new_email:
-                    row["email"] = new_email
-            rows.append(row)
-
-    with open(FILENAME, mode="w", newline="") as file:
-        writer = csv.DictWriter(file, fieldnames=FIELDS)
-        writer.writeheader()
-        writer.writerows(rows)
+    with lock.exclusive():
+        with open(FILENAME, mode="r") as file:
+            reader = csv.DictReader(file)
+            for row in reader:
+                if row["id"] == str(user_id):
+                    version = int(row.get("version") or 0)
+                    if expected_version is not None and int(expected_version) != version:
+                        raise VersionConflict(row["id"], int(expected_version), version)
+                    if new_name:
+                        row["name"] = new_name
+                    if new_email:
+                        row["email"] = new_email
+                    row["version"] = version + 1
+                rows.append(row)
+        write_rows(rows)
     print(f"User {user_id} updated!")
 
 
 def delete_user(user_id):
     """Delete a user by ID."""
-    rows = []
-    with open(FILENAME, mode="r") as file:
-        reader = csv.DictReader(file)
-        rows = [row for row in reader if row["id"] != str(user_id)]
-
-    with open(FILENAME, mode="w", newline="") as file:
-        writer = csv.DictWriter(file, fieldnames=FIELDS)
-        writer.writeheader()
-        writer.writerows(rows)
+    with lock.exclusive():
+        with open(FILENAME, mode="r") as file:
+            reader = csv.DictReader(file)
+            rows = [row for row in reader if row["id"] != str(user_id)]
+        write_rows(rows)
     print(f"User {user_id} deleted!")
\ No newline at end of file
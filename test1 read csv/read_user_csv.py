@@ -1,21 +1,30 @@
-import csv, os, time, random
-from password_generator import password_game
-from RPS2 import rps
-from Number_guessing_game import number_guessing_game
+import csv, os, time, json, itertools, functools, random
+from id_sequence import IdSequence
+from game_registry import GameRegistry
+from file_lock import FileLock, VersionConflict
+import otp_store
+import game_telemetry
+import csv_pages
 
 # ----------------------
 # Global Config
 # ----------------------
 FILENAME = "test1 read csv/users.csv"
-FIELDS = ["id", "name", "verify_otp", "timestamp", "games"]  # <-- added 'games'
+FIELDS = ["id", "name", "verify_otp", "timestamp", "game_mask", "version"]  # allowed games as a bitmask; version +1 per change
 ADMIN_PASSWORD = "admin123"  # <-- change this to something secure
+JOURNAL_COMPACT_AFTER = 500  # journal records before users.csv is rewritten
+UPDATE_RETRIES = 8  # tries when another process changed the same user first
+OTP_TTL_SECONDS = 120
+OTP_ATTEMPTS = 3
+PAGE_SIZE = 20  # users per page in the admin listing
 
+# games come from games.json; a game's module is only imported when it is first played
+games = GameRegistry()
 # numeric codes -> labels for display
-GAME_LABELS = {
-    "1": "Password Generator Game",
-    "2": "RPS Game",
-    "3": "Number Guessing Game",
-}
+GAME_LABELS = games.labels()
+# game code -> bit in the user's game_mask (game 1 = 1, game 2 = 2, game 3 = 4)
+GAME_BITS = games.bits()
+ALL_GAMES_MASK = sum(GAME_BITS.values())
 
 # ----------------------
 # Helpers
@@ -26,39 +35,461 @@ def clear():
 def init_file():
     """Create CSV with headers if missing and migrate older schema."""
     os.makedirs(os.path.dirname(FILENAME), exist_ok=True)
-    if not os.path.exists(FILENAME):
-        with open(FILENAME, "w", newline="") as file:
-            writer = csv.DictWriter(file, fieldnames=FIELDS)
-            writer.writeheader()
-    else:
-        migrate_file_schema()  # ensure 'games' column exists
+    with users.lock.exclusive():  # another copy of this script may be starting too
+        if not os.path.exists(FILENAME):
+            with open(FILENAME, "w", newline="") as file:
+                writer = csv.DictWriter(file, fieldnames=FIELDS)
+                writer.writeheader()
+            if os.path.exists(users.journal_path):
+                os.remove(users.journal_path)  # leftovers from a CSV that was deleted
+            write_schema_version(SCHEMA_VERSION)
+        else:
+            migrate_file_schema()  # bring older files up to the current columns
 
-def migrate_file_schema():
-    """If CSV exists without 'games' column, add it with default '1,2,3'."""
-    with open(FILENAME, "r", newline="") as file:
-        reader = csv.DictReader(file)
-        fieldnames = reader.fieldnames or []
-        if "games" in fieldnames:
-            return  # already good
-        rows = list(reader)
+# ----------------------
+# Schema Migrations
+# ----------------------
+# Each migration upgrades one row dict to the next schema version. The file
+# is streamed through every pending migration a chunk at a time into a temp
+# file that then replaces users.csv, so memory stays flat and an interrupted
+# run leaves the old file untouched. The version is recorded afterwards in
+# users.csv.schema, so row functions must be safe to run on an upgraded row.
+SCHEMA_FILE = FILENAME + ".schema"
+MIGRATION_CHUNK_ROWS = 1000
 
-    # add default games to each row and rewrite file with new header
-    for row in rows:
+def _add_games_column(row):
+    """v1: every user may play every game until an admin restricts it."""
+    if row.get("games") is None:
         row["games"] = "1,2,3"
-    with open(FILENAME, "w", newline="") as file:
-        writer = csv.DictWriter(file, fieldnames=FIELDS)
+    return row
+
+def _games_to_mask_column(row):
+    """v2: '1,2,3' in 'games' becomes the integer bitmask 7 in 'game_mask'."""
+    if not str(row.get("game_mask") or "").isdigit():
+        row["game_mask"] = str(game_mask(row))
+    row.pop("games", None)
+    return row
+
+def _add_version_column(row):
+    """v3: change counter for optimistic concurrency; existing rows start at 1."""
+    if not str(row.get("version") or "").isdigit():
+        row["version"] = "1"
+    return row
+
+# (version, columns after it, row function) -- add new migrations at the end
+MIGRATIONS = [
+    (1, ["id", "name", "verify_otp", "timestamp", "games"], _add_games_column),
+    (2, ["id", "name", "verify_otp", "timestamp", "game_mask"], _games_to_mask_column),
+    (3, ["id", "name", "verify_otp", "timestamp", "game_mask", "version"], _add_version_column),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def read_schema_version():
+    """Version recorded in users.csv.schema, or guessed from the CSV header."""
+    try:
+        with open(SCHEMA_FILE, "r") as file:
+            return int(file.read().strip())
+    except (FileNotFoundError, ValueError):
+        pass
+    with open(FILENAME, "r", newline="") as file:
+        header = next(csv.reader(file), [])
+    for version, fields, _ in reversed(MIGRATIONS):
+        if header == fields:
+            return version
+    return 0
+
+def write_schema_version(version):
+    tmp_path = SCHEMA_FILE + ".tmp"
+    with open(tmp_path, "w") as file:
+        file.write(f"{version}\n")
+    os.replace(tmp_path, SCHEMA_FILE)
+
+def migrate_file_schema():
+    """Stream users.csv through any pending migrations and swap the result in."""
+    version = read_schema_version()
+    pending = [m for m in MIGRATIONS if m[0] > version]
+    if not pending:
+        return
+    fields = pending[-1][1]
+
+    tmp_path = FILENAME + ".tmp"
+    with open(FILENAME, "r", newline="") as src, open(tmp_path, "w", newline="") as dst:
+        writer = csv.DictWriter(dst, fieldnames=fields, extrasaction="ignore")
         writer.writeheader()
-        writer.writerows(rows)
+        rows = _fold_journal(csv.DictReader(src), _journal_changes())
+        while True:
+            chunk = list(itertools.islice(rows, MIGRATION_CHUNK_ROWS))
+            if not chunk:
+                break
+            for _, _, upgrade in pending:
+                chunk = [upgrade(row) for row in chunk]
+            writer.writerows(chunk)
+        dst.flush()
+        os.fsync(dst.fileno())
+    os.replace(tmp_path, FILENAME)
+    # the journal's changes are now part of the new file
+    if os.path.exists(users.journal_path):
+        open(users.journal_path, "wb").close()
+    write_schema_version(pending[-1][0])
+    print(f"Upgraded {FILENAME} to schema v{pending[-1][0]}.")
+
+def _journal_changes():
+    """Final state of every id touched by the journal: row dict, or None if deleted."""
+    changes = {}
+    try:
+        with open(users.journal_path, "rb") as file:
+            data = file.read()  # small: it is compacted every JOURNAL_COMPACT_AFTER records
+    except FileNotFoundError:
+        return changes
+    for line in data[:data.rfind(b"\n") + 1].splitlines():
+        if line.strip():
+            record = json.loads(line)
+            if record["op"] == "upsert":
+                changes[record["row"]["id"]] = record["row"]
+            elif record["op"] == "delete":
+                changes[str(record["id"])] = None
+    return changes
+
+def _fold_journal(rows, changes):
+    """Yield the CSV rows with journal changes applied, then journal-only new rows."""
+    for row in rows:
+        user_id = row.get("id", "")
+        if user_id in changes:
+            row = changes.pop(user_id)
+            if row is None:
+                continue
+        yield row
+    for row in changes.values():
+        if row is not None:
+            yield row
+
+# ----------------------
+# Indexed User Repository
+# ----------------------
+class UserRepository:
+    """
+    Users from the CSV, indexed by id and by name so lookups are O(1).
+
+    Changes are not written by rewriting the CSV. Each one is appended to a
+    journal file (one JSON line: a full-row "upsert" or a "delete" by id).
+    The current state = the CSV snapshot with the journal applied on top.
+    Once the journal holds `compact_after` records it is folded into a new
+    CSV (temp file + rename, so a crash leaves the old or the new file, never
+    half of one) and emptied. Replaying a record twice is harmless, so a
+    crash between the rename and emptying the journal loses nothing.
+
+    The files are only read again when they change on disk (mtime/size),
+    and a journal that only grew is read from where we stopped.
+    Lookups hand out copies, so callers can't change the cached rows by accident.
+
+    Several processes can share the files. Reads hold a shared flock() on
+    users.csv.lock and writes an exclusive one, so nobody sees a half-done
+    compaction. Every row has a version that goes up by one per change: a
+    write must carry the version it read, otherwise VersionConflict is raised
+    and nothing is written. update() re-reads and retries in that case, so
+    two processes changing the same user never silently overwrite each other.
+    """
+
+    def __init__(self, filename, journal_path=None, compact_after=JOURNAL_COMPACT_AFTER):
+        self.filename = filename
+        self.journal_path = journal_path or filename + ".journal"
+        self.compact_after = compact_after
+        self.lock = FileLock(filename + ".lock")
+        self.retries = UPDATE_RETRIES
+        self.conflicts = 0  # VersionConflicts retried by update() (for the stress test)
+        self._signature = None  # (inode, mtime_ns, size) of the CSV we last loaded
+        self._journal_offset = 0  # bytes of the journal already applied
+        self._journal_records = 0
+        self._by_id = {}  # insertion order = file order
+        self._by_name = {}
+        self._max_id = 0
+        self._game_bitmaps = {}  # game code -> bytearray, bit n set = user n may play; built on first use
+
+    def _file_signature(self):
+        stat = os.stat(self.filename)
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)  # inode: compaction swaps in a new file
+
+    def _journal_size(self):
+        try:
+            return os.path.getsize(self.journal_path)
+        except FileNotFoundError:
+            return 0
+
+    def refresh(self):
+        """Bring the index up to date with the CSV and the journal on disk."""
+        if self._file_signature() == self._signature and self._journal_size() == self._journal_offset:
+            return  # nothing changed on disk: no need to take the lock
+        with self.lock.shared():
+            signature = self._file_signature()  # before reading: a later change forces another reload
+            if signature != self._signature or self._journal_size() < self._journal_offset:
+                with open(self.filename, "r", newline="") as file:
+                    self._load_rows(csv.DictReader(file))
+                self._signature = signature
+                self._journal_offset = 0
+                self._journal_records = 0
+            self._read_journal()
+
+    def _load_rows(self, rows):
+        self._by_id = {}
+        self._by_name = {}
+        self._max_id = 0
+        self._game_bitmaps = {}
+        for row in rows:
+            if row.get("id", "") not in self._by_id:
+                self._put(row)
+
+    def _read_journal(self):
+        """Apply journal records we haven't seen yet (only whole lines)."""
+        if self._journal_size() <= self._journal_offset:
+            return
+        with open(self.journal_path, "rb") as file:
+            file.seek(self._journal_offset)
+            data = file.read()
+        end = data.rfind(b"\n") + 1  # a line still being written is left for next time
+        for line in data[:end].splitlines():
+            if line.strip():
+                self._apply(json.loads(line))
+                self._journal_records += 1
+        self._journal_offset += end
+
+    def _apply(self, record):
+        if record["op"] == "upsert":
+            self._put(record["row"])
+        elif record["op"] == "delete":
+            self._remove(str(record["id"]))
+
+    def _put(self, row):
+        user_id = row.get("id", "")
+        old = self._by_id.get(user_id)
+        if old is not None and self._by_name.get(old.get("name")) is old:
+            del self._by_name[old.get("name")]
+        self._by_id[user_id] = row
+        self._by_name.setdefault(row.get("name", ""), row)
+        if str(user_id).isdigit():
+            self._max_id = max(self._max_id, int(user_id))
+            self._index_games(int(user_id), game_mask(row))
+
+    def _remove(self, user_id):
+        row = self._by_id.pop(user_id, None)
+        if row is None:
+            return
+        if user_id.isdigit():
+            self._index_games(int(user_id), 0)
+        name = row.get("name", "")
+        if self._by_name.get(name) is row:
+            del self._by_name[name]
+            # another user with the same name (if any) takes over the name lookup
+            for other in self._by_id.values():
+                if other.get("name", "") == name:
+                    self._by_name[name] = other
+                    break
+
+    def _index_games(self, user_id, mask):
+        byte, bit = divmod(user_id, 8)
+        for code, bitmap in self._game_bitmaps.items():
+            if mask & GAME_BITS[code]:
+                if byte >= len(bitmap):
+                    bitmap.extend(bytes(byte - len(bitmap) + 1))
+                bitmap[byte] |= 1 << bit
+            elif byte < len(bitmap):
+                bitmap[byte] &= ~(1 << bit) & 0xFF
+
+    def _game_bitmap(self, code):
+        """Bitmap for one game, built from the rows the first time it is asked for."""
+        bitmap = self._game_bitmaps.get(code)
+        if bitmap is None:
+            bitmap = self._game_bitmaps[code] = bytearray(self._max_id // 8 + 1)
+            game_bit = GAME_BITS[code]
+            for user_id, row in self._by_id.items():
+                if str(user_id).isdigit() and game_mask(row) & game_bit:
+                    byte, bit = divmod(int(user_id), 8)
+                    bitmap[byte] |= 1 << bit
+        return bitmap
+
+    def ids_with_game(self, code):
+        """Ids of every user allowed to play game `code`, from the bitmap index."""
+        self.refresh()
+        ids = []
+        for byte_index, byte in enumerate(self._game_bitmap(code)):
+            while byte:
+                low = byte & -byte  # lowest set bit
+                ids.append(byte_index * 8 + low.bit_length() - 1)
+                byte ^= low
+        return ids
+
+    def change_games(self, user_ids, grant=0, revoke=0):
+        """
+        Add the `grant` bits and remove the `revoke` bits for every id in
+        user_ids, in one pass and one journal write. Returns how many changed.
+        """
+        def attempt():
+            self.refresh()
+            now = time.strftime("%Y-%m-%d %H:%M:%S")
+            changed = []
+            for user_id in user_ids:
+                row = self._by_id.get(str(user_id))
+                if row is None:
+                    continue
+                old = game_mask(row)
+                new = (old | grant) & ~revoke & ALL_GAMES_MASK
+                if new != old:
+                    changed.append(dict(row, game_mask=str(new), timestamp=now))
+            if changed:
+                self.upsert_many(changed)
+            return len(changed)
+        return self._retry(attempt)
+
+    def all_rows(self):
+        self.refresh()
+        return [dict(row) for row in self._by_id.values()]
+
+    def get_by_id(self, user_id):
+        self.refresh()
+        row = self._by_id.get(str(user_id))
+        return dict(row) if row else None
+
+    def get_by_name(self, name):
+        self.refresh()
+        row = self._by_name.get(name)
+        return dict(row) if row else None
+
+    def max_id(self):
+        try:
+            self.refresh()
+        except FileNotFoundError:
+            return 0
+        return self._max_id
+
+    def update(self, user_id, change):
+        """
+        Read-modify-write one user: change(row) edits the row dict in place.
+        If another process saved the user in between, re-read and run change()
+        again. Returns the saved row, or None if there is no such user.
+        """
+        def attempt():
+            row = self.get_by_id(user_id)
+            if row is None:
+                return None
+            change(row)
+            self.upsert(row)
+            return row
+        return self._retry(attempt)
+
+    def _retry(self, attempt):
+        """Call attempt() until it gets through without a VersionConflict."""
+        for tries in range(self.retries):
+            try:
+                return attempt()
+            except VersionConflict:
+                if tries == self.retries - 1:
+                    raise
+                self.conflicts += 1
+                time.sleep(random.uniform(0, 0.005 * 2 ** tries))  # back off so the retries don't collide again
+
+    def upsert(self, row):
+        """Add or replace one user (matched by id)."""
+        self.upsert_many([row])
+
+    def upsert_many(self, rows):
+        """
+        Add or replace many users with a single journal write. Each row must
+        carry the version it was read at (none for a new user); if any of them
+        was changed since, VersionConflict is raised and nothing is written.
+        On success the rows' "version" is updated to the saved one.
+        """
+        rows = list(rows)
+        with self.lock.exclusive():
+            self.refresh()
+            records = []
+            for row in rows:
+                user_id = str(row.get("id", ""))
+                current = self._by_id.get(user_id)
+                found = row_version(current) if current else 0
+                if row_version(row) != found:
+                    raise VersionConflict(user_id, row_version(row), found)
+                saved = {k: str(row.get(k, "")) for k in FIELDS}
+                saved["version"] = str(found + 1)
+                records.append({"op": "upsert", "row": saved})
+            self._append(records)
+        for row, record in zip(rows, records):
+            row["version"] = record["row"]["version"]
+
+    def delete(self, user_id):
+        with self.lock.exclusive():
+            self._append([{"op": "delete", "id": str(user_id)}])
+
+    def _append(self, records):
+        # Called with the exclusive lock held.
+        # One write of whole lines, flushed to disk before we report success.
+        data = "".join(json.dumps(record) + "\n" for record in records).encode("utf-8")
+        with open(self.journal_path, "ab") as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        self.refresh()
+        if self._journal_records >= self.compact_after:
+            self.compact()
+
+    def compact(self):
+        """Fold the journal into a fresh CSV and empty the journal."""
+        with self.lock.exclusive():
+            self.refresh()
+            self.save(list(self._by_id.values()))
+
+    def save(self, rows):
+        """Replace the CSV with `rows` atomically and empty the journal (no version checks)."""
+        with self.lock.exclusive():
+            self._save(rows)
+
+    def _save(self, rows):
+        rows = [dict(row) for row in rows]  # our own copies, so later edits by the caller don't leak in
+        tmp_path = self.filename + ".tmp"
+        with open(tmp_path, "w", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.filename)
+        # The new CSV already contains every journal record, so it can go.
+        with open(self.journal_path, "wb"):
+            pass
+        self._load_rows(rows)
+        self._signature = self._file_signature()
+        self._journal_offset = 0
+        self._journal_records = 0
+
+
+def row_version(row):
+    """A row's change counter (0 for rows written before versions existed)."""
+    value = str(row.get("version") or "")
+    return int(value) if value.isdigit() else 0
+
+users = UserRepository(FILENAME)
+# next id lives in users.csv.seq; rebuilt from the highest id in the CSV if lost
+id_sequence = IdSequence(FILENAME + ".seq", recover=lambda: users.max_id(), lock=users.lock)
+# one record per game played; admin stats read the rollup, not the whole log
+telemetry = game_telemetry.GameTelemetry(os.path.join(os.path.dirname(FILENAME), "game_sessions.log"))
+
 
 def read_all_rows():
-    with open(FILENAME, "r", newline="") as file:
-        return list(csv.DictReader(file))
+    return users.all_rows()
 
 def write_all_rows(rows):
-    with open(FILENAME, "w", newline="") as file:
-        writer = csv.DictWriter(file, fieldnames=FIELDS)
-        writer.writeheader()
-        writer.writerows(rows)
+    """
+    Save the rows from read_all_rows() that were edited. Leaving a row out no
+    longer deletes it: that raises ValueError (use delete_user() to delete).
+    VersionConflict if another process changed one of them meanwhile.
+    """
+    current = {row["id"]: row for row in read_all_rows()}
+    missing = current.keys() - {str(row.get("id")) for row in rows}
+    if missing:
+        raise ValueError(f"write_all_rows: rows for id(s) {', '.join(sorted(missing))} are missing; "
+                         "use delete_user() to delete users")
+    changed = [row for row in rows
+               if any(str(row.get(k, "")) != current.get(str(row.get("id")), {}).get(k) for k in FIELDS)]
+    if changed:
+        users.upsert_many(changed)
 
 def get_all_ids():
     try:
@@ -67,30 +498,49 @@ def get_all_ids():
         return []
 
 def generate_new_id():
-    ids = get_all_ids()
-    return max(ids) + 1 if ids else 1
+    return id_sequence.next_id()
 
 def get_user_by_id(user_id: int):
-    for row in read_all_rows():
-        if row["id"] == str(user_id):
-            return row
-    return None
+    return users.get_by_id(user_id)
 
 def get_user_by_name(name: str):
-    for row in read_all_rows():
-        if row["name"] == name:
-            return row
-    return None
+    return users.get_by_name(name)
 
 def parse_games(value: str) -> set[str]:
     """Parse '1,2,3' -> {'1','2','3'} with validation."""
     if not value:
         return set()
     allowed = {x.strip() for x in value.split(",")}
-    return {g for g in allowed if g in {"1","2","3"}}
+    return {g for g in allowed if g in GAME_BITS}
+
+def games_to_mask(games_set) -> int:
+    return sum(GAME_BITS[g] for g in set(games_set) if g in GAME_BITS)
+
+# masks are decoded once each, on first use: a table of every possible mask
+# would double in size with each game added
+@functools.lru_cache(maxsize=1024)
+def mask_games(mask) -> frozenset:
+    return frozenset(code for code, bit in GAME_BITS.items() if mask & bit)
+
+@functools.lru_cache(maxsize=1024)
+def mask_labels(mask) -> str:
+    return ", ".join(game.label for game in games if game.code in mask_games(mask))
 
-def games_to_label_list(games_set: set[str]) -> str:
-    return ", ".join(GAME_LABELS[g] for g in sorted(games_set))
+def game_mask(row) -> int:
+    """Allowed-games bitmask of a row; still understands the old 'games' = '1,2,3' column."""
+    value = str(row.get("game_mask") or "")
+    if value.isdigit():
+        return int(value) & ALL_GAMES_MASK
+    if row.get("games") is None:
+        return ALL_GAMES_MASK  # the old default
+    return games_to_mask(parse_games(row["games"]))
+
+def user_games(row) -> frozenset:
+    """Set of game codes ('1', '2', ...) this user may play."""
+    return mask_games(game_mask(row))
+
+def games_to_label_list(games_set) -> str:
+    return mask_labels(games_to_mask(games_set))
 
 # ----------------------
 # User Functions
@@ -104,42 +554,53 @@ def add_user(name):
         "name": name,
         "verify_otp": "Not Verified",
         "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
-        "games": "1,2,3",  # default: all games; admin can restrict later
+        "game_mask": ALL_GAMES_MASK,  # default: all games; admin can restrict later
     }
-    rows = read_all_rows()
-    rows.append({k: str(v) for k, v in row.items()})
-    write_all_rows(rows)
+    users.upsert(row)
     return user_id
 
+def add_users(names):
+    """Add many users at once: one block of ids, one journal write. Returns their ids."""
+    ids = id_sequence.reserve(len(names))
+    now = time.strftime("%Y-%m-%d %H:%M:%S")
+    users.upsert_many(
+        {"id": user_id, "name": name, "verify_otp": "Not Verified", "timestamp": now, "game_mask": ALL_GAMES_MASK}
+        for user_id, name in zip(ids, names)
+    )
+    return list(ids)
+
+
+# pending codes live in memory (see otp_store.py); expired ones are swept out
+otps = otp_store.OtpStore(ttl=OTP_TTL_SECONDS, attempts=OTP_ATTEMPTS, length=4)
 
-def generate_otp(length=4):
-    return ''.join(str(random.randint(0, 9)) for _ in range(length))
+def generate_otp(user_id):
+    """Issue a fresh 4-digit code for this user (replaces any older one)."""
+    return otps.issue(str(user_id))
 
-def verify_otp_process(user_id, otp, attempts=3, ttl=120):
+def verify_otp_process(user_id):
     """Verify OTP and update CSV with the actual code if success."""
-    start_time = time.time()
-    while attempts > 0:
-        if time.time() - start_time > ttl:
-            print("⏰ Code expired.")
-            return False
+    while True:
         entered = input("Enter the 4-digit verification code: ").strip()
-        if entered == otp:
+        result = otps.check(str(user_id), entered)
+        if result == otp_store.OK:
             print("✅ Verified!\n")
-            update_user_verification(user_id, otp)
+            update_user_verification(user_id, entered)
             return True
-        attempts -= 1
-        print(f"❌ Wrong. {attempts} tries left.")
-    return False
+        if result == otp_store.WRONG:
+            print(f"❌ Wrong. {otps.tries_left(str(user_id))} tries left.")
+        elif result == otp_store.EXPIRED:
+            print("⏰ Code expired.")
+            return False
+        else:  # LOCKED or UNKNOWN
+            print("❌ Wrong. 0 tries left.")
+            return False
 
 def update_user_verification(user_id, otp):
     """Update CSV row with verified OTP."""
-    rows = read_all_rows()
-    for row in rows:
-        if row["id"] == str(user_id):
-            row["verify_otp"] = otp
-            row["timestamp"] = time.strftime("%Y-%m-%d %H:%M:%S")
-            break
-    write_all_rows(rows)
+    def change(row):
+        row["verify_otp"] = otp
+        row["timestamp"] = time.strftime("%Y-%m-%d %H:%M:%S")
+    users.update(user_id, change)
 
 # ----------------------
 # Admin Functions
@@ -160,32 +621,201 @@ def verify_admin_password(attempts=3):
     time.sleep(1)
     return False
 
-def show_all_users():
-    rows = read_all_rows()
+# ----------------------
+# Paged User Listing
+# ----------------------
+# byte offset of every page in users.csv, so page N is a seek, not a re-read of pages 1..N-1
+pages = csv_pages.PageIndex(FILENAME, page_size=PAGE_SIZE)
+
+def _is_verified(row):
+    return row.get("verify_otp", "") not in ("", "Not Verified")
+
+def parse_user_filter(text):
+    """
+    Turn a filter like 'ann verified:no games:2' into a row -> bool function.
+      ann / name:ann     name contains 'ann' (any case)
+      verified:yes|no    OTP verified or not
+      games:2,3          may play all these games (games:none = no games at all)
+    All terms must match. Raises ValueError for anything else.
+    """
+    tests = []
+    for term in text.split():
+        key, sep, value = term.partition(":")
+        if not sep:
+            key, value = "name", term
+        key, value = key.lower(), value.strip().lower()
+        if key == "name":
+            tests.append(lambda row, part=value: part in row.get("name", "").lower())
+        elif key == "verified":
+            if value not in ("yes", "no"):
+                raise ValueError("verified: must be yes or no")
+            tests.append(lambda row, want=value == "yes": _is_verified(row) == want)
+        elif key == "games" and value == "none":
+            tests.append(lambda row: game_mask(row) == 0)
+        elif key == "games":
+            codes = [code.strip() for code in value.split(",") if code.strip()]
+            unknown = [code for code in codes if code not in GAME_BITS]
+            if unknown or not codes:
+                raise ValueError(f"Unknown game code(s): {', '.join(unknown) or value}")
+            needed = games_to_mask(codes)
+            tests.append(lambda row, needed=needed: game_mask(row) & needed == needed)
+        else:
+            raise ValueError(f"Unknown filter '{key}:' (use name:, verified: or games:)")
+    return lambda row: all(test(row) for test in tests)
+
+def _listing_rows(start, changes, tail):
+    """
+    (position, row) from `start` on: the CSV streamed from its byte offset with
+    pending journal changes applied, then users that are only in the journal.
+    A position is (byte offset, index into tail), so positions sort in listing order.
+    """
+    offset, skip = start
+    if offset < pages.size:
+        for row_offset, row in pages.rows(offset):
+            user_id = row.get("id", "")
+            if user_id in changes:
+                row = changes[user_id]
+                if row is None:  # deleted
+                    continue
+            yield (row_offset, 0), row
+        skip = 0
+    for i in range(skip, len(tail)):
+        yield (pages.size, i), tail[i]
+
+def _read_page(starts, page, changes, tail, matches):
+    """Rows of one page, plus where the next page starts if that wasn't known yet."""
+    stop = starts[page + 1] if page + 1 < len(starts) else None
+    shown = []
+    for position, row in _listing_rows(starts[page], changes, tail):
+        if stop is not None and position >= stop:
+            break
+        if matches is not None and not matches(row):
+            continue
+        if len(shown) == PAGE_SIZE:
+            return shown, position
+        shown.append(row)
+    return shown, None
+
+def _print_page(rows, page, total_pages, highlight=None):
+    clear()
+    print(f"=== USERS - page {page + 1} of {total_pages or '?'} ===")
+    print(f"  {'ID':>6}  {'Name':<20}  {'Verified':<8}  {'Last change':<19}  Games")
+    print("─" * 78)
     for row in rows:
-        print("─" * 40)
-        for key in FIELDS:
-            label = key.replace("_", " ").title()
-            value = row.get(key, "")
-            if key == "games":
-                value = games_to_label_list(parse_games(value))
-            print(f"{label:<14}: {value}")
-    print("─" * 40)
+        marker = "▶" if row.get("id") == highlight else " "
+        games_label = mask_labels(game_mask(row)) or "(none)"
+        name = " ".join(row.get("name", "").split())  # keep one user per line
+        print(f"{marker} {row.get('id', ''):>6}  {name:<20.20}  "
+              f"{'yes' if _is_verified(row) else 'no':<8}  {row.get('timestamp', ''):<19}  {games_label}")
+    if not rows:
+        print("  (no users)")
+    print("─" * 78)
+
+def show_all_users():
+    """
+    Page through the users PAGE_SIZE at a time, streamed from users.csv.
+    Only the page on screen is held in memory; pages are found through the
+    byte-offset index, so jumping to page 500 reads one page, not 500.
+    Another process may compact (replace) users.csv meanwhile: every read
+    first checks the file under the shared lock and starts over if it changed.
+    """
+    def snapshot():
+        pages.refresh()
+        changes = _journal_changes()  # small: compacted every JOURNAL_COMPACT_AFTER records
+        # users added since the last compaction (ids are never reused, so they are above the CSV's max id)
+        tail = sorted(
+            (row for user_id, row in changes.items()
+             if row is not None and user_id.isdigit() and int(user_id) > pages.max_id),
+            key=lambda row: int(row["id"]),
+        )
+        all_starts = [(offset, 0) for offset in pages.offsets]
+        all_starts += [(pages.size, i) for i in range(0, len(tail), PAGE_SIZE)]
+        return changes, tail, all_starts or [(pages.size, 0)]
+
+    def csv_replaced():
+        return pages._file_signature() != pages.signature
+
+    changes, tail, all_starts = snapshot()
+    matches, starts, complete = None, list(all_starts), True
+    page, highlight = 0, None
+    while True:
+        with users.lock.shared():  # no compaction while this page is read
+            if csv_replaced():
+                changes, tail, all_starts = snapshot()
+                if matches is None:
+                    starts, complete, page = list(all_starts), True, min(page, len(all_starts) - 1)
+                else:
+                    starts, complete, page = [(0, 0)], False, 0
+            rows, next_start = _read_page(starts, page, changes, tail, matches)
+        if next_start is not None and page + 1 == len(starts):
+            starts.append(next_start)  # filtered view: learn page starts as we go
+        elif next_start is None and page + 1 == len(starts):
+            complete = True
+        _print_page(rows, page, len(starts) if complete else None, highlight)
+        if matches is not None:
+            print(f"Filter: {filter_text}")
+        command = input("[Enter] next  p prev  g <page>  j <id>  f <filter> (f = clear)  q quit: ").strip()
+        action, _, argument = command.partition(" ")
+        action, argument, highlight = action.lower(), argument.strip(), None
+
+        if action == "q":
+            return
+        elif action in ("", "n"):
+            if page + 1 < len(starts):
+                page += 1
+        elif action == "p":
+            page = max(0, page - 1)
+        elif action == "g" and argument.isdigit():
+            wanted = int(argument) - 1
+            if 0 <= wanted < len(starts):
+                page = wanted
+            else:
+                print(f"No page {argument}" + ("" if complete else " yet (filtered pages are found as you go)"))
+                time.sleep(1)
+        elif action == "j" and argument.isdigit():
+            found = None
+            with users.lock.shared():
+                if csv_replaced():
+                    changes, tail, all_starts = snapshot()
+                    matches, starts, complete, page = None, list(all_starts), True, 0
+                if argument in changes and changes[argument] is None:
+                    pass  # deleted since the last compaction
+                elif int(argument) > pages.max_id:
+                    position = next((i for i, row in enumerate(tail) if row["id"] == argument), None)
+                    if position is not None:
+                        found = len(pages.offsets) + position // PAGE_SIZE
+                else:
+                    found = pages.page_for_id(int(argument))
+            if found is None:
+                print(f"No user with ID {argument}.")
+                time.sleep(1)
+                continue
+            matches, starts, complete = None, list(all_starts), True  # jumping clears the filter
+            page, highlight = found, argument
+        elif action == "f":
+            if not argument:
+                matches, starts, complete, page = None, list(all_starts), True, 0
+                continue
+            try:
+                matches = parse_user_filter(argument)
+            except ValueError as e:
+                print(f"❌ {e}")
+                time.sleep(1)
+                continue
+            filter_text, starts, complete, page = argument, [(0, 0)], False, 0
+        else:
+            print("Invalid choice")
+            time.sleep(1)
 
 def delete_user(user_id):
-    rows = [r for r in read_all_rows() if r["id"] != str(user_id)]
-    write_all_rows(rows)
+    users.delete(user_id)
 
 def update_user_games(user_id: int, games_list: list[str]):
     """Persist allowed games (e.g. ['1','3']) for the user."""
-    cleaned = ",".join(sorted({g for g in games_list if g in {"1","2","3"}}))
-    rows = read_all_rows()
-    for row in rows:
-        if row["id"] == str(user_id):
-            row["games"] = cleaned
-            row["timestamp"] = time.strftime("%Y-%m-%d %H:%M:%S")
-            break
-    write_all_rows(rows)
+    def change(row):
+        row["game_mask"] = games_to_mask(games_list)
+        row["timestamp"] = time.strftime("%Y-%m-%d %H:%M:%S")
+    users.update(user_id, change)
 
 def admin_set_user_games():
     """Prompt admin to set allowed games for a specific user."""
@@ -202,8 +832,7 @@ def admin_set_user_games():
         time.sleep(1)
         return
 
-    current = parse_games(user.get("games", "1,2,3"))
-    print("\nCurrent allowed games:", games_to_label_list(current) or "(none)")
+    print("\nCurrent allowed games:", mask_labels(game_mask(user)) or "(none)")
     print("Available codes:")
     for code, label in GAME_LABELS.items():
         print(f"  {code} = {label}")
@@ -218,6 +847,82 @@ def admin_set_user_games():
     print("✅ Updated.")
     time.sleep(1)
 
+def choose_game_code():
+    """Ask for one game code; returns None if it isn't valid."""
+    for code, label in GAME_LABELS.items():
+        print(f"  {code} = {label}")
+    code = input("Game code: ").strip()
+    if code not in GAME_BITS:
+        print("Unknown game code.")
+        time.sleep(1)
+        return None
+    return code
+
+def admin_list_game_players():
+    """Show every user allowed to play one game (answered from the bitmap index)."""
+    code = choose_game_code()
+    if code is None:
+        return
+    ids = users.ids_with_game(code)
+    print(f"\n{len(ids)} user(s) may play {GAME_LABELS[code]}:")
+    for user_id in ids:
+        user = get_user_by_id(user_id)
+        print(f"  {user_id}: {user['name'] if user else '?'}")
+
+def _format_totals(totals):
+    outcomes = ", ".join(f"{count} {name}" for name, count in zip(game_telemetry.OUTCOMES, totals["outcomes"]) if count)
+    minutes = totals["seconds"] / 60
+    return f"{totals['plays']} play(s), {minutes:.1f} min ({outcomes})"
+
+def _game_name(bit):
+    game = games.by_bit(bit)
+    return game.label if game else f"(removed game, bit {bit})"
+
+def admin_game_stats():
+    """Per-game totals, the top players, and optionally one user's history."""
+    stats = telemetry.stats()
+    if not stats["games"]:
+        print("No games played yet.")
+        return
+    print("\n=== GAME STATS ===")
+    for bit, totals in sorted(stats["games"].items()):
+        print(f"{_game_name(bit)}: {_format_totals(totals)}")
+
+    top = sorted(stats["users"].items(), key=lambda item: -sum(t["seconds"] for t in item[1].values()))[:5]
+    print("\nTop players (time played):")
+    for user_id, per_game in top:
+        user = get_user_by_id(user_id)
+        minutes = sum(t["seconds"] for t in per_game.values()) / 60
+        print(f"  {user_id}: {user['name'] if user else '?'} - {minutes:.1f} min")
+
+    uid = input("\nUser ID for details (Enter to skip): ").strip()
+    if uid.isdigit():
+        per_game = telemetry.user_stats(int(uid))
+        if not per_game:
+            print("That user hasn't played anything yet.")
+        for bit, totals in sorted(per_game.items()):
+            print(f"  {_game_name(bit)}: {_format_totals(totals)}")
+
+def admin_bulk_change_games():
+    """Grant or revoke one game for many users at once."""
+    code = choose_game_code()
+    if code is None:
+        return
+    action = input("g) grant  r) revoke: ").strip().lower()
+    if action not in ("g", "r"):
+        print("Choose g or r.")
+        time.sleep(1)
+        return
+    raw = input("User IDs separated by commas, or 'all': ").strip().lower()
+    if raw == "all":
+        ids = [int(r["id"]) for r in read_all_rows() if str(r.get("id", "")).isdigit()]
+    else:
+        ids = [int(x) for x in raw.split(",") if x.strip().isdigit()]
+    bit = GAME_BITS[code]
+    changed = users.change_games(ids, grant=bit if action == "g" else 0, revoke=bit if action == "r" else 0)
+    print(f"✅ Changed {changed} user(s).")
+    time.sleep(1)
+
 # ----------------------
 # Interfaces
 # ----------------------
@@ -227,24 +932,24 @@ def user_interface():
 
     if existing_user:
         print(f"Welcome back, {name}! Your ID is {existing_user['id']}\n")
-        otp = generate_otp()
+        otp = generate_otp(existing_user['id'])
         print(f"(DEBUG) OTP sent: {otp}")
-        if verify_otp_process(existing_user['id'], otp):
+        if verify_otp_process(existing_user['id']):
             # fetch fresh row (verify_otp updated)
             user = get_user_by_id(int(existing_user["id"]))
-            allowed = parse_games(user.get("games", "1,2,3"))
-            user_game_menu(allowed)
+            allowed = user_games(user)
+            user_game_menu(allowed, int(user["id"]))
         else:
             print("🚫 Verification failed.")
     else:
         user_id = add_user(name)
         print(f"Welcome, {name}! Your ID is {user_id}")
-        otp = generate_otp()
+        otp = generate_otp(user_id)
         print(f"(DEBUG) OTP sent: {otp}")
-        if verify_otp_process(user_id, otp):
+        if verify_otp_process(user_id):
             user = get_user_by_id(user_id)
-            allowed = parse_games(user.get("games", "1,2,3"))
-            user_game_menu(allowed)
+            allowed = user_games(user)
+            user_game_menu(allowed, int(user["id"]))
         else:
             print("🚫 Verification failed.")
 
@@ -255,12 +960,14 @@ def admin_interface():
         print("1) Show all users")
         print("2) Delete user")
         print("3) Set user allowed games")  # <-- new
+        print("4) Who may play a game")
+        print("5) Grant/revoke a game for many users")
+        print("6) Game stats")
         print("0) Exit")
         choice = input("Choose: ").strip()
 
         if choice == "1":
             show_all_users()
-            input("Press Enter to continue...")
         elif choice == "2":
             uid = input("Enter ID to delete: ").strip()
             delete_user(uid)
@@ -268,6 +975,14 @@ def admin_interface():
             time.sleep(1)
         elif choice == "3":
             admin_set_user_games()
+        elif choice == "4":
+            admin_list_game_players()
+            input("Press Enter to continue...")
+        elif choice == "5":
+            admin_bulk_change_games()
+        elif choice == "6":
+            admin_game_stats()
+            input("Press Enter to continue...")
         elif choice == "0":
             break
         else:
@@ -276,8 +991,21 @@ def admin_interface():
 
 # ----------------------
 # User Games Menu
-# ----------------------s
-def user_game_menu(allowed: set[str]):
+# ----------------------
+def play_game(game, user_id):
+    """Run one game and log the session (start, end, how it ended)."""
+    outcome = game_telemetry.ERROR
+    start = time.time()
+    try:
+        game.launch()
+        outcome = game_telemetry.FINISHED
+    except (KeyboardInterrupt, EOFError):
+        outcome = game_telemetry.QUIT
+        raise
+    finally:
+        telemetry.record(user_id, game.bit, start, time.time(), outcome)
+
+def user_game_menu(allowed: set[str], user_id: int):
     clear()
     if not allowed:
         print("Your account currently has no games enabled. Please contact an admin.")
@@ -286,9 +1014,9 @@ def user_game_menu(allowed: set[str]):
 
     while True:
         print("\n=== GAME MENU ===")
-        if "1" in allowed: print("1. Password Generator Game")
-        if "2" in allowed: print("2. RPS Game (rock-paper-scissors)")
-        if "3" in allowed: print("3. Number Guessing Game")
+        for game in games:
+            if game.code in allowed:
+                print(f"{game.code}. {game.menu_label}")
         print("0. Logout / Exit")
 
         choice = input("Choose: ").strip()
@@ -296,12 +1024,9 @@ def user_game_menu(allowed: set[str]):
             print("👋 Logged out. Goodbye!")
             break
 
-        if choice == "1" and "1" in allowed:
-            password_game()
-        elif choice == "2" and "2" in allowed:
-            rps()
-        elif choice == "3" and "3" in allowed:
-            number_guessing_game()
+        game = games.get(choice)
+        if game is not None and choice in allowed:
+            play_game(game, user_id)
         else:
             print("❌ Not allowed or invalid choice.")
             time.sleep(1)
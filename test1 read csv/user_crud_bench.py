@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the user_crud_cli data layer
+===========================================
+
+Seeds a temporary database with N users for each requested size and measures
+throughput and latency percentiles for the CRUD functions, plus
+verify_password() and the old "new connection per call" lookup for
+comparison. Results are printed and written as JSON so runs can be diffed.
+
+How to run
+----------
+    python user_crud_bench.py
+    python user_crud_bench.py --sizes 10000,100000,1000000 --output bench.json
+    python user_crud_bench.py --compare old_bench.json     # show % change
+    python user_crud_bench.py --shards 4 --write-procs 4   # sharded store, parallel writers
+
+A temporary database is used, so your real users.db is never touched.
+The read-through cache is switched off unless --cache is given, so reads
+measure SQLite rather than a dict lookup.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import sqlite3
+import tempfile
+import time
+from typing import Any, Callable, Dict, Iterator, Optional
+
+import user_crud_cli as crud
+
+SEED_BATCH = 50_000
+
+
+def seed_users(count: int) -> None:
+    """Insert `count` demo users straight into the database (fast path, one shared hash)."""
+    salt, password_hash = crud.hash_password("secret")
+
+    def rows(start: int, stop: int) -> Iterator[tuple]:
+        for i in range(start, stop):
+            yield (f"user{i}", f"User {i}", f"user{i}@example.com", "user", salt, password_hash)
+
+    sql = crud.insert_user_sql()
+    for start in range(0, count, SEED_BATCH):
+        by_db: Dict[str, list[tuple]] = {}
+        for row in rows(start, min(count, start + SEED_BATCH)):
+            by_db.setdefault(crud.db_for_username(row[0]), []).append(row)
+        for db_name, shard_rows in by_db.items():
+            with crud.get_connection(db_name) as conn:
+                conn.executemany(sql, shard_rows)
+
+
+def read_with_fresh_connection(user_id: int):
+    """The old code path: connect, query, close — on every single call."""
+    conn = sqlite3.connect(crud.db_for_id(user_id))
+    conn.row_factory = sqlite3.Row
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT * FROM users WHERE id = ?;", (user_id,))
+        return cur.fetchone()
+    finally:
+        conn.close()
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def measure(name: str, func: Callable[..., Any], calls: list[tuple]) -> Dict[str, Any]:
+    """Time func(*args) for every args tuple and summarise the latencies."""
+    latencies = []
+    start = time.perf_counter()
+    for args in calls:
+        t0 = time.perf_counter()
+        func(*args)
+        latencies.append(time.perf_counter() - t0)
+    return summarise(name, latencies, time.perf_counter() - start)
+
+
+def _update_worker(job: tuple) -> list[float]:
+    """Child process: run update_user on every id in the job, return latencies."""
+    db_name, shard_count, user_ids = job
+    crud.DB_NAME = db_name
+    crud.SHARD_COUNT = shard_count
+    crud.user_cache.max_size = 0
+    latencies = []
+    for user_id in user_ids:
+        t0 = time.perf_counter()
+        crud.update_user(user_id, full_name="Renamed")
+        latencies.append(time.perf_counter() - t0)
+    crud.close_connections()
+    return latencies
+
+
+def measure_parallel_updates(procs: int, user_ids: list[int]) -> Dict[str, Any]:
+    """update_user from `procs` processes at once: shows how writes scale with shards."""
+    jobs = [(crud.DB_NAME, crud.SHARD_COUNT, user_ids[i::procs]) for i in range(procs)]
+    with multiprocessing.Pool(procs) as pool:
+        pool.map(abs, range(procs))  # start the workers before the clock does
+        start = time.perf_counter()
+        results = pool.map(_update_worker, jobs, chunksize=1)
+        total = time.perf_counter() - start
+    latencies = [latency for result in results for latency in result]
+    return summarise(f"update_user ({procs} processes)", latencies, total)
+
+
+def summarise(name: str, latencies: list[float], total: float) -> Dict[str, Any]:
+    latencies.sort()
+    return {
+        "op": name,
+        "calls": len(latencies),
+        "total_s": round(total, 6),
+        "ops_per_sec": round(len(latencies) / total, 1) if total else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 4),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 4),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 4),
+        "max_ms": round(latencies[-1] * 1000, 4) if latencies else 0.0,
+    }
+
+
+def bench_size(size: int, args: argparse.Namespace, tmp_dir: str) -> Dict[str, Any]:
+    """Seed a fresh database with `size` users and run every measurement on it."""
+    crud.close_connections()
+    crud.user_cache.clear()
+    crud.DB_NAME = os.path.join(tmp_dir, f"bench_{size}.db")
+
+    t0 = time.perf_counter()
+    crud.init_db()
+    seed_users(size)
+    seed_seconds = time.perf_counter() - t0
+
+    # Seeded users are user0..user{size-1}; with shards their ids are not
+    # contiguous, so sample from the ids that actually exist.
+    all_ids = [row["id"] for row in crud.iter_users() if row["username"] != "admin"]
+    rng = random.Random(args.seed)
+    def random_id() -> int:
+        return rng.choice(all_ids)
+
+    salt, password_hash = crud.hash_password("secret")
+    delete_ids = rng.sample(all_ids, min(args.ops, size))
+
+    results = [
+        measure("read_user_by_id (new connection per call)", read_with_fresh_connection,
+                [(random_id(),) for _ in range(args.ops)]),
+        measure("read_user_by_id", crud.read_user_by_id,
+                [(random_id(),) for _ in range(args.ops)]),
+        measure("read_user_by_username", crud.read_user_by_username,
+                [(f"user{random_id() - 2}",) for _ in range(args.ops)]),
+        measure("list_users", crud.list_users, [() for _ in range(args.list_ops)]),
+        measure("update_user", lambda user_id: crud.update_user(user_id, full_name="Renamed"),
+                [(random_id(),) for _ in range(args.ops)]),
+    ]
+    if args.write_procs > 1:
+        crud.close_connections()  # don't share open SQLite handles with forked children
+        results.append(measure_parallel_updates(args.write_procs, [random_id() for _ in range(args.ops)]))
+    results += [
+        measure("create_user", crud.create_user,
+                [(f"new{i}", "New User", f"new{i}@example.com", "user", "secret")
+                 for i in range(args.hash_ops)]),
+        measure("verify_password", crud.verify_password,
+                [("secret", salt, password_hash) for _ in range(args.hash_ops)]),
+        measure("delete_user", crud.delete_user, [(user_id,) for user_id in delete_ids]),
+    ]
+    return {"users": size, "shards": crud.SHARD_COUNT, "seed_seconds": round(seed_seconds, 3), "results": results}
+
+
+def print_report(report: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> None:
+    old = {}
+    if baseline:
+        for run in baseline.get("runs", []):
+            for result in run["results"]:
+                old[(run["users"], result["op"])] = result["ops_per_sec"]
+
+    for run in report["runs"]:
+        print(f"\n=== {run['users']:,} users, {run.get('shards', 1)} shard(s) (seeded in {run['seed_seconds']}s) ===")
+        print(f"{'operation':<44}{'ops/sec':>12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        for r in run["results"]:
+            line = f"{r['op']:<44}{r['ops_per_sec']:>12,.0f}{r['p50_ms']:>10.3f}{r['p95_ms']:>10.3f}{r['p99_ms']:>10.3f}"
+            before = old.get((run["users"], r["op"]))
+            if before:
+                line += f"  ({(r['ops_per_sec'] - before) / before:+.0%} vs baseline)"
+            print(line)
+    print()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the user_crud_cli data layer.")
+    parser.add_argument("--sizes", default="10000,100000",
+                        help="comma-separated user counts to seed (e.g. 10000,100000,1000000)")
+    parser.add_argument("--ops", type=int, default=5000, help="calls per fast operation")
+    parser.add_argument("--hash-ops", type=int, default=50,
+                        help="calls for create_user / verify_password (these hash passwords)")
+    parser.add_argument("--list-ops", type=int, default=3, help="calls to list_users (reads the whole table)")
+    parser.add_argument("--hash-cost", type=int, default=crud.HASH_COST, help="scrypt cost to benchmark with")
+    parser.add_argument("--cache", action="store_true", help="keep the read-through user cache on")
+    parser.add_argument("--shards", type=int, default=crud.SHARD_COUNT, help="number of SQLite files to spread users over")
+    parser.add_argument("--write-procs", type=int, default=1,
+                        help="also time update_user from this many processes at once")
+    parser.add_argument("--seed", type=int, default=42, help="random seed for the id workload")
+    parser.add_argument("--output", default="bench_results.json", help="where to write the JSON report")
+    parser.add_argument("--compare", help="earlier JSON report to compare ops/sec against")
+    args = parser.parse_args()
+
+    crud.HASH_COST = args.hash_cost
+    crud.SHARD_COUNT = args.shards
+    if not args.cache:
+        crud.user_cache.max_size = 0
+
+    report: Dict[str, Any] = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "hash_cost": args.hash_cost,
+        "cache": args.cache,
+        "shards": args.shards,
+        "runs": [],
+    }
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in (int(s) for s in args.sizes.split(",")):
+            print(f"Benchmarking with {size:,} users...")
+            report["runs"].append(bench_size(size, args, tmp_dir))
+        crud.close_connections()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+    print_report(report, baseline)
+
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,8 +10,17 @@ What this script does
 - Supports two roles:
     * admin — can Create, Read, Update, Delete any user
     * user  — can view and update ONLY their own profile, and change password
-- Hashes passwords with sha256 + a unique random salt (demo-level security)
-  (For production, use a real password hasher like bcrypt/argon2.)
+- Hashes passwords with scrypt + a unique random salt. Older accounts that
+  still have a plain sha256 hash are upgraded automatically the next time
+  they log in. The scrypt cost can be tuned with USER_CRUD_HASH_COST
+  (scrypt N = 2 ** cost, default 14) and hashing for logins and bulk imports
+  runs in a pool of USER_CRUD_HASH_WORKERS processes (default: CPU count).
+- Users looked up by id for display (the admin "View user by ID" screen and
+  the server's GET /users/<id>) are kept in a small in-process LRU cache
+  (USER_CRUD_CACHE_SIZE rows, default 1024, for USER_CRUD_CACHE_TTL seconds,
+  default 30). Set USER_CRUD_CACHE_SIZE=0 to turn it off. Logins, session
+  checks and password changes always read the database. Hit/miss/eviction
+  counts are on the hidden "stats" admin screen.
 
 How to run
 ----------
@@ -22,100 +31,648 @@ How to run
        password: admin123
    **Change this password immediately** after you log in.
 
+Bulk import
+-----------
+    python user_crud_cli.py import new_users.csv
+    python user_crud_cli.py import new_users.jsonl --batch-size 10000
+
+Each record needs: username, full_name, email, role, password.
+Rows that clash with an existing username/email are reported and skipped;
+the rest of the file is still imported.
+
+Server mode
+-----------
+    python user_crud_server.py      # JSON API over the same functions
+    python user_crud_loadtest.py    # requests/sec against a running server
+
+Sharded mode
+------------
+    USER_CRUD_SHARDS=4 python user_crud_cli.py
+
+Spreads users over N SQLite files (users.shard0.db ... users.shard3.db) by a
+hash of the username, so writes to different shards don't wait for each other.
+IDs stay globally unique (shard k only hands out ids where id % N == k).
+Listing, search and export read all shards and merge the results; backups
+write one file per shard and the change feed is read per shard (--shard).
+Usernames stay unique everywhere (a username always hashes to the same
+shard). Each shard's UNIQUE(email) only sees its own users, so writes that
+set an email take a lock file (users.db.emails.lock) and check every shard
+first; a clash raises the same IntegrityError as in a single file.
+Pick N once: changing it later would send usernames to different files.
+
+Backup & export
+---------------
+    python user_crud_cli.py backup users-backup.db
+    python user_crud_cli.py export users.csv
+    python user_crud_cli.py export users.jsonl.gz
+
+Both are safe to run while the menus or the server are in use: the backup
+copies a few pages at a time and the export reads a single snapshot.
+
+Change feed
+-----------
+    python user_crud_cli.py changes --after 0            # every change so far
+    python user_crud_cli.py changes --after 1234 --follow
+
+Prints one JSON object per line ({"seq", "op", "user_id", "changed_at",
+"data"}) from the append-only user_changes table. A mirror remembers the
+last seq it applied and asks only for what came after it.
+
+Query stats
+-----------
+    USER_CRUD_STATS=1 USER_CRUD_SLOW_MS=20 python user_crud_cli.py
+
+Counts calls, rows and latency (as a histogram) for every data-layer
+function, and appends any call slower than USER_CRUD_SLOW_MS (default 50)
+to slow_queries.log together with the SQL it ran (string values hidden).
+Admins type "stats" at the admin menu to see the numbers, switch them
+on/off, or save them as JSON. When off, each call pays one flag check.
+
+Assistant (optional)
+--------------------
+    python user_crud_cli.py ask "How do I reset a user's password?"
+
+Admins also get an "Ask the assistant" menu entry. The backend is picked with
+USER_CRUD_ASSISTANT: "stub" (default, works offline) or "openai" (needs the
+openai package and OPENAI_API_KEY; model from USER_CRUD_ASSISTANT_MODEL).
+Answers are cached on disk in assistant_cache.json, so repeated questions
+never go back to the network. Nothing is contacted until you ask something.
+
+Sessions
+--------
+A successful login returns an opaque session token (secrets.token_urlsafe).
+The menus and the JSON server then look the session up in an in-memory
+dict instead of checking the password and reading the user again. Sessions
+expire after USER_CRUD_SESSION_TTL idle seconds (default 1800); a
+background thread sweeps out expired ones. Set USER_CRUD_SESSION_FILE to
+keep sessions across restarts (the file holds live tokens — keep it private).
+
+Sessions live in the memory of the process that issued them. Every menu
+step and every server call except GET /me and POST /logout re-reads the
+user's row, so a delete, password change or role change made by another
+process (the CLI while the server runs) ends or updates the session there
+too. Logging out, however, only reaches the process that issued the token,
+and the session file belongs to one process: it is rewritten from that
+process's sessions, so two processes sharing it erase each other's.
+
 Notes
 -----
 - The database file (users.db) is created in the same folder as this script.
+- The database runs in WAL mode, so you will also see users.db-wal and
+  users.db-shm next to it while the program is running.
 - All input is text-based; follow the on-screen menus.
 """
 
 import os
+import csv
+import gzip
+import json
+import time
+import argparse
 import sqlite3
 import getpass
 import hashlib
 import secrets
-from typing import Optional, Tuple, Dict, Any
-from openai import OpenAI
+import threading
+import tempfile
+import atexit
+import heapq
+import bisect
+import functools
+import re
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple, Dict, Any, Iterable, Iterator, Callable
+
+from file_lock import FileLock
 
 DB_NAME = "users.db"
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-response = client.chat.completions.create(
-    model="gpt-5",
-    messages=[{"role": "user", "content": "Hello, how are you?"}]
-)
 
-print(response.choices[0].message.content)
 # ---------- Password Utilities ----------
 
-def hash_password(plain_password: str, salt: Optional[str] = None) -> Tuple[str, str]:
+# Stored format: "scrypt$<cost>$<r>$<p>$<hex digest>" in the password_hash column.
+# Rows created before scrypt hold a bare sha256 hex digest ("legacy").
+HASH_SCHEME = "scrypt"
+HASH_COST = int(os.getenv("USER_CRUD_HASH_COST", "14"))  # scrypt N = 2 ** HASH_COST
+SCRYPT_R = 8
+SCRYPT_P = 1
+
+
+def hash_password(
+    plain_password: str,
+    salt: Optional[str] = None,
+    cost: Optional[int] = None,
+) -> Tuple[str, str]:
     """
-    Hash a password with SHA-256 and a random per-user salt.
-    Returns (salt, password_hash) as hex strings.
-    NOTE: For real apps, use bcrypt/argon2 instead of sha256.
+    Hash a password with scrypt and a random per-user salt.
+    Returns (salt, password_hash) as strings; the hash records its own cost,
+    so raising HASH_COST later does not break existing passwords.
     """
     if salt is None:
         # 16 random bytes -> 32 hex chars
         salt = secrets.token_hex(16)
-    # Combine salt + password; encode to bytes; hash with sha256; return hex digest
-    digest = hashlib.sha256((salt + plain_password).encode("utf-8")).hexdigest()
-    return salt, digest
+    if cost is None:
+        cost = HASH_COST
+    digest = _scrypt(plain_password, salt, cost, SCRYPT_R, SCRYPT_P)
+    return salt, f"{HASH_SCHEME}${cost}${SCRYPT_R}${SCRYPT_P}${digest}"
+
+
+def _scrypt(plain_password: str, salt: str, cost: int, r: int, p: int) -> str:
+    n = 2 ** cost
+    return hashlib.scrypt(
+        plain_password.encode("utf-8"),
+        salt=salt.encode("utf-8"),
+        n=n,
+        r=r,
+        p=p,
+        maxmem=2 * 128 * r * (n + p),  # scrypt needs ~128*r*N bytes of memory
+    ).hex()
+
+
+def _legacy_sha256(plain_password: str, salt: str) -> str:
+    """The original (pre-scrypt) hash: sha256(salt + password) as hex."""
+    return hashlib.sha256((salt + plain_password).encode("utf-8")).hexdigest()
 
 
 def verify_password(plain_password: str, salt: str, expected_hash: str) -> bool:
-    """Check a plaintext password against a stored (salt, hash)."""
-    _, digest = hash_password(plain_password, salt=salt)
-    return secrets.compare_digest(digest, expected_hash)
+    """Check a plaintext password against a stored (salt, hash) of either scheme."""
+    if expected_hash.startswith(HASH_SCHEME + "$"):
+        _, cost, r, p, expected_digest = expected_hash.split("$")
+        digest = _scrypt(plain_password, salt, int(cost), int(r), int(p))
+        return secrets.compare_digest(digest, expected_digest)
+    return secrets.compare_digest(_legacy_sha256(plain_password, salt), expected_hash)
+
+
+def needs_rehash(password_hash: str) -> bool:
+    """True for legacy sha256 hashes and scrypt hashes made with an older cost."""
+    if not password_hash.startswith(HASH_SCHEME + "$"):
+        return True
+    _, cost, r, p, _ = password_hash.split("$")
+    return (int(cost), int(r), int(p)) != (HASH_COST, SCRYPT_R, SCRYPT_P)
+
+
+# ---------- Hashing Service ----------
+
+def _hash_job(job: Tuple[str, int]) -> Tuple[str, str]:
+    """Worker-process entry point for HashingService.hash_many()."""
+    plain_password, cost = job
+    return hash_password(plain_password, cost=cost)
+
+
+def _verify_job(job: Tuple[str, str, str]) -> bool:
+    """Worker-process entry point for HashingService.verify_many()."""
+    return verify_password(*job)
+
+
+class HashingService:
+    """
+    Runs password hashing in a pool of worker processes so that expensive
+    scrypt work uses every core instead of blocking the caller's thread.
+    The pool is only started the first time it is needed.
+    """
+
+    def __init__(self, workers: Optional[int] = None, cost: Optional[int] = None):
+        self.workers = workers or int(os.getenv("USER_CRUD_HASH_WORKERS", "0")) or os.cpu_count() or 1
+        self.cost = cost
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def _chunksize(self, count: int) -> int:
+        # A few chunks per worker keeps them all busy without per-item IPC.
+        return max(1, count // (self.workers * 4))
+
+    def hash_many(self, passwords: list[str]) -> list[Tuple[str, str]]:
+        """Hash a batch of passwords in parallel; returns [(salt, hash), ...] in order."""
+        cost = self.cost if self.cost is not None else HASH_COST
+        jobs = [(password, cost) for password in passwords]
+        return list(self._pool().map(_hash_job, jobs, chunksize=self._chunksize(len(jobs))))
+
+    def verify_many(self, checks: list[Tuple[str, str, str]]) -> list[bool]:
+        """Verify a batch of (plain_password, salt, expected_hash) in parallel."""
+        return list(self._pool().map(_verify_job, checks, chunksize=self._chunksize(len(checks))))
+
+    def verify(self, plain_password: str, salt: str, expected_hash: str) -> bool:
+        """Verify one password on a worker process (blocks only the calling thread)."""
+        return self._pool().submit(verify_password, plain_password, salt, expected_hash).result()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+
+hashing_service = HashingService()
+atexit.register(hashing_service.shutdown)
 
 
 # ---------- Database Helpers ----------
 
-def get_connection() -> sqlite3.Connection:
-    """Open a SQLite connection with sensible defaults."""
-    conn = sqlite3.connect(DB_NAME)
+# Applied once to every new connection.
+# WAL lets readers keep reading while a writer commits, and synchronous=NORMAL
+# is still crash-safe in WAL mode but skips the fsync on every commit.
+DB_PRAGMAS = (
+    "PRAGMA journal_mode = WAL;",
+    "PRAGMA synchronous = NORMAL;",
+    "PRAGMA cache_size = -16000;",  # negative means KiB -> ~16 MB page cache
+    "PRAGMA temp_store = MEMORY;",
+    "PRAGMA busy_timeout = 5000;",  # wait up to 5s for a writer instead of failing
+)
+# How many compiled SQL statements each connection keeps around for reuse.
+STATEMENT_CACHE_SIZE = 256
+
+# One open connection per (thread, database file), reused by every call.
+_pool = threading.local()
+_pool_lock = threading.Lock()
+_pool_generation = 0
+_open_connections: list[sqlite3.Connection] = []
+
+
+def _open_connection(db_name: str) -> sqlite3.Connection:
+    """Open a new SQLite connection and apply DB_PRAGMAS."""
+    start = time.perf_counter()
+    # check_same_thread=False only so close_connections() can close it from
+    # another thread; each connection is still used by the thread that owns it.
+    conn = sqlite3.connect(
+        db_name,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        check_same_thread=False,
+    )
     # Make rows behave like dicts: row["column_name"]
     conn.row_factory = sqlite3.Row
+    for pragma in DB_PRAGMAS:
+        conn.execute(pragma)
+    if query_stats.enabled:
+        conn.set_trace_callback(_trace_sql)
+        query_stats.record("open_connection", time.perf_counter() - start, 0)
+    return conn
+
+
+def get_connection(db_name: Optional[str] = None) -> sqlite3.Connection:
+    """
+    Return this thread's pooled connection to db_name (default DB_NAME),
+    opening it on first use. Use it as `with get_connection() as conn:` —
+    the block commits (or rolls back on error) but the connection stays open.
+    """
+    conns = getattr(_pool, "conns", None)
+    # Start a fresh pool after close_connections() or in a forked child process.
+    if conns is None or _pool.generation != _pool_generation or _pool.pid != os.getpid():
+        conns = _pool.conns = {}
+        _pool.generation = _pool_generation
+        _pool.pid = os.getpid()
+
+    if db_name is None:
+        db_name = DB_NAME
+    conn = conns.get(db_name)
+    if conn is None:
+        conn = _open_connection(db_name)
+        conns[db_name] = conn
+        with _pool_lock:
+            _open_connections.append(conn)
     return conn
 
 
+def close_connections() -> None:
+    """Close every pooled connection (from all threads)."""
+    global _pool_generation
+    with _pool_lock:
+        for conn in _open_connections:
+            conn.close()
+        _open_connections.clear()
+        _pool_generation += 1
+
+
+atexit.register(close_connections)
+
+
+# ---------- Query Stats ----------
+
+# Off unless USER_CRUD_STATS=1 (or switched on from the admin menu).
+QUERY_STATS_ENABLED = os.getenv("USER_CRUD_STATS", "") == "1"
+SLOW_QUERY_MS = float(os.getenv("USER_CRUD_SLOW_MS", "50"))
+SLOW_QUERY_LOG = "slow_queries.log"
+# Upper bounds (ms) of the latency histogram buckets; the last catches the rest.
+LATENCY_BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, float("inf"))
+MAX_TRACED_STATEMENTS = 20  # SQL statements kept per call for the slow log
+
+# SQL run by the instrumented call currently active on this thread.
+_trace = threading.local()
+
+
+def _trace_sql(statement: str) -> None:
+    """sqlite3 trace callback: remember the SQL the current call runs."""
+    statements = getattr(_trace, "statements", None)
+    if statements is not None and len(statements) < MAX_TRACED_STATEMENTS:
+        statements.append(statement)
+
+
+def _redact_sql(statement: str) -> str:
+    """Collapse whitespace and hide string values (salts, hashes, emails)."""
+    return re.sub(r"'(?:[^']|'')*'", "'?'", " ".join(statement.split()))
+
+
+class QueryStats:
+    """Per-operation call counts, rows, latency histograms and a slow-query log."""
+
+    def __init__(self, enabled: bool, slow_ms: float, log_path: str):
+        self.enabled = False
+        self.slow_ms = slow_ms
+        self.log_path = log_path
+        self._lock = threading.Lock()
+        self._ops: Dict[str, Dict[str, Any]] = {}
+        if enabled:
+            self.enable()
+
+    def enable(self) -> None:
+        self.enabled = True
+        self._set_trace(_trace_sql)
+
+    def disable(self) -> None:
+        self.enabled = False
+        self._set_trace(None)
+
+    @staticmethod
+    def _set_trace(callback: Optional[Callable[[str], None]]) -> None:
+        # Tracing costs a Python call per statement, so it is only attached while enabled.
+        with _pool_lock:
+            for conn in _open_connections:
+                conn.set_trace_callback(callback)
+
+    def record(self, op: str, seconds: float, rows: int, statements: Optional[list[str]] = None) -> None:
+        ms = seconds * 1000
+        with self._lock:
+            stats = self._ops.get(op)
+            if stats is None:
+                stats = self._ops[op] = {
+                    "calls": 0, "rows": 0, "total_ms": 0.0, "max_ms": 0.0,
+                    "buckets": [0] * len(LATENCY_BUCKETS_MS),
+                }
+            stats["calls"] += 1
+            stats["rows"] += rows
+            stats["total_ms"] += ms
+            stats["max_ms"] = max(stats["max_ms"], ms)
+            stats["buckets"][bisect.bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        if ms >= self.slow_ms:
+            self._log_slow(op, ms, rows, statements or [])
+
+    def _log_slow(self, op: str, ms: float, rows: int, statements: list[str]) -> None:
+        entry = {
+            "at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "op": op,
+            "ms": round(ms, 3),
+            "rows": rows,
+            "sql": [_redact_sql(statement) for statement in statements],
+        }
+        with self._lock, open(self.log_path, "a", encoding="utf-8") as file:
+            file.write(json.dumps(entry) + "\n")
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Copy of the numbers so far, with percentiles estimated from the histogram."""
+        with self._lock:
+            ops = {op: dict(stats, buckets=list(stats["buckets"])) for op, stats in self._ops.items()}
+        result = {}
+        for op, stats in sorted(ops.items()):
+            calls = stats["calls"]
+            result[op] = {
+                "calls": calls,
+                "rows": stats["rows"],
+                "total_ms": round(stats["total_ms"], 3),
+                "avg_ms": round(stats["total_ms"] / calls, 4),
+                "p50_ms": self._percentile(stats, 50),
+                "p95_ms": self._percentile(stats, 95),
+                "p99_ms": self._percentile(stats, 99),
+                "max_ms": round(stats["max_ms"], 4),
+                "histogram_ms": {
+                    f"<={bound:g}": count
+                    for bound, count in zip(LATENCY_BUCKETS_MS, stats["buckets"]) if count
+                },
+            }
+        return result
+
+    @staticmethod
+    def _percentile(stats: Dict[str, Any], pct: float) -> float:
+        """Upper bound of the bucket holding the pct-th call (capped at the max seen)."""
+        needed = stats["calls"] * pct / 100
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS_MS, stats["buckets"]):
+            seen += count
+            if seen >= needed:
+                return round(min(bound, stats["max_ms"]), 4)
+        return round(stats["max_ms"], 4)
+
+    def report(self) -> None:
+        snapshot = self.snapshot()
+        if not snapshot:
+            print("No calls recorded yet.")
+            return
+        print(f"{'operation':<24}{'calls':>9}{'rows':>10}{'avg ms':>10}{'p95 ms':>10}{'max ms':>10}")
+        for op, stats in snapshot.items():
+            print(f"{op:<24}{stats['calls']:>9}{stats['rows']:>10}{stats['avg_ms']:>10.3f}"
+                  f"{stats['p95_ms']:>10.3f}{stats['max_ms']:>10.3f}")
+
+    def dump_json(self, path: str, **extra: Any) -> None:
+        """Save the snapshot; `extra` adds more top-level sections (e.g. user_cache=...)."""
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump({"slow_ms": self.slow_ms, "ops": self.snapshot(), **extra}, file, indent=2)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._ops.clear()
+
+
+query_stats = QueryStats(QUERY_STATS_ENABLED, SLOW_QUERY_MS, SLOW_QUERY_LOG)
+
+_DONE = object()
+
+
+def _rows_returned(result: Any) -> int:
+    if result is None:
+        return 0
+    if isinstance(result, list):
+        return len(result)
+    return 1
+
+
+def instrumented(op: str, rows: Callable[[Any], int] = _rows_returned) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """
+    Decorator for data-layer functions: when query_stats is on, time each call,
+    count the rows it returned and keep the SQL it ran for the slow-query log.
+    Iterators are timed only while they are producing rows.
+    """
+    def decorate(func: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not query_stats.enabled:
+                return func(*args, **kwargs)
+            outer = getattr(_trace, "statements", None)
+            _trace.statements = statements = []
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            finally:
+                _trace.statements = outer
+            seconds = time.perf_counter() - start
+            if isinstance(result, Iterator):
+                return _timed_iter(op, result, seconds, statements)
+            query_stats.record(op, seconds, rows(result), statements)
+            return result
+        return wrapper
+    return decorate
+
+
+def _timed_iter(op: str, iterator: Iterator[Any], seconds: float, statements: list[str]) -> Iterator[Any]:
+    count = 0
+    try:
+        while True:
+            outer = getattr(_trace, "statements", None)
+            _trace.statements = statements
+            start = time.perf_counter()
+            try:
+                item = next(iterator, _DONE)
+            finally:
+                seconds += time.perf_counter() - start
+                _trace.statements = outer
+            if item is _DONE:
+                return
+            count += 1
+            yield item
+    finally:
+        query_stats.record(op, seconds, count, statements)
+
+
+# Sharded mode (USER_CRUD_SHARDS > 1): users live in N files, picked by a
+# stable hash of the username. Shard k only allocates ids with id % N == k,
+# so ids are unique across files and an id alone tells us its shard.
+SHARD_COUNT = int(os.getenv("USER_CRUD_SHARDS", "1"))
+
+
+def shard_db_name(shard: int) -> str:
+    """File name for one shard (just DB_NAME when sharding is off)."""
+    if SHARD_COUNT <= 1:
+        return DB_NAME
+    base, ext = os.path.splitext(DB_NAME)
+    return f"{base}.shard{shard}{ext}"
+
+
+def all_db_names() -> list[str]:
+    return [shard_db_name(shard) for shard in range(max(1, SHARD_COUNT))]
+
+
+def shard_for_username(username: str) -> int:
+    if SHARD_COUNT <= 1:
+        return 0
+    # Not hash(): that is randomised per process. blake2b is stable everywhere.
+    digest = hashlib.blake2b(username.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % SHARD_COUNT
+
+
+def shard_for_id(user_id: int) -> int:
+    return user_id % SHARD_COUNT if SHARD_COUNT > 1 else 0
+
+
+def db_for_username(username: str) -> str:
+    return shard_db_name(shard_for_username(username))
+
+
+def db_for_id(user_id: int) -> str:
+    return shard_db_name(shard_for_id(user_id))
+
+
+_email_locks: Dict[str, FileLock] = {}
+
+
+def email_lock() -> FileLock:
+    """Cross-process lock held while emails are checked and written in sharded mode."""
+    path = DB_NAME + ".emails.lock"
+    if path not in _email_locks:
+        _email_locks[path] = FileLock(path)
+    return _email_locks[path]
+
+
+def emails_taken(emails: Iterable[str], except_id: Optional[int] = None) -> set[str]:
+    """Which of `emails` some user (other than except_id) already has, in any shard."""
+    payload = json.dumps(sorted(set(emails)))
+    taken: set[str] = set()
+    for db_name in all_db_names():
+        with get_connection(db_name) as conn:
+            taken.update(row[0] for row in conn.execute(
+                "SELECT email FROM users WHERE email IN (SELECT value FROM json_each(?)) AND id IS NOT ?;",
+                (payload, except_id),
+            ))
+    return taken
+
+
+@contextmanager
+def unique_email(email: Optional[str], except_id: Optional[int] = None) -> Iterator[None]:
+    """
+    Sharded mode: raise IntegrityError if another shard already has `email`,
+    and keep other processes from claiming it until the caller's write is done.
+    Single file: nothing to do, the UNIQUE constraint covers it.
+    """
+    if SHARD_COUNT <= 1 or not email:
+        yield
+        return
+    with email_lock().exclusive():
+        if emails_taken([email], except_id):
+            raise sqlite3.IntegrityError("UNIQUE constraint failed: users.email")
+        yield
+
+
+INSERT_USER_SQL = """
+    INSERT INTO users (username, full_name, email, role, salt, password_hash)
+    VALUES (?, ?, ?, ?, ?, ?);
+"""
+
+# Global id allocator for sharded mode: continue from the highest id this shard
+# ever used (sqlite_sequence) in steps of shard_count. It runs inside the
+# INSERT, i.e. under the shard's write lock, so concurrent processes can't
+# hand out the same id. Takes the same parameters as INSERT_USER_SQL.
+SHARDED_INSERT_USER_SQL = """
+    INSERT INTO users (id, username, full_name, email, role, salt, password_hash)
+    VALUES (
+        (SELECT COALESCE(
+                    (SELECT seq FROM sqlite_sequence WHERE name = 'users'),
+                    CASE WHEN shard_index = 0 THEN 0 ELSE shard_index - shard_count END
+                ) + shard_count
+         FROM shard_info),
+        ?, ?, ?, ?, ?, ?
+    );
+"""
+
+
+def insert_user_sql() -> str:
+    return SHARDED_INSERT_USER_SQL if SHARD_COUNT > 1 else INSERT_USER_SQL
+
+
 def init_db() -> None:
     """
-    Create tables if they don't exist.
+    Create tables if they don't exist (in every shard when sharding is on).
     Also seed a default admin (admin/admin123) if no admin exists yet.
     """
-    with get_connection() as conn:
-        cur = conn.cursor()
-        # Create a "users" table. The 'id' column auto-increments for each row.
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                full_name TEXT,
-                email TEXT UNIQUE,
-                role TEXT NOT NULL CHECK(role IN ('admin', 'user')),
-                salt TEXT NOT NULL,
-                password_hash TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            );
-            """
-        )
-        conn.commit()
-
-        # If no admin exists, create a default one.
-        cur.execute("SELECT COUNT(*) AS c FROM users WHERE role = 'admin';")
-        count_admin = cur.fetchone()["c"]
-        if count_admin == 0:
-            # Seed default admin account
-            username = "admin"
-            full_name = "Default Admin"
-            email = "admin@example.com"
-            role = "admin"
-            salt, password_hash = hash_password("admin123")
+    count_admin = 0
+    for shard, db_name in enumerate(all_db_names()):
+        with get_connection(db_name) as conn:
+            count_admin += _init_schema(conn, shard)
+
+    if count_admin == 0:
+        # Seed default admin account
+        username = "admin"
+        full_name = "Default Admin"
+        email = "admin@example.com"
+        role = "admin"
+        salt, password_hash = hash_password("admin123")
+        with get_connection(db_for_username(username)) as conn:
             try:
-                cur.execute(
-                    """
-                    INSERT INTO users (username, full_name, email, role, salt, password_hash)
-                    VALUES (?, ?, ?, ?, ?, ?);
-                    """,
+                conn.execute(
+                    insert_user_sql(),
                     (username, full_name, email, role, salt, password_hash),
                 )
                 conn.commit()
@@ -126,52 +683,481 @@ def init_db() -> None:
                 pass
 
 
+def _init_schema(conn: sqlite3.Connection, shard: int) -> int:
+    """Create the schema in one database file; returns how many admins it holds."""
+    cur = conn.cursor()
+    # Create a "users" table. The 'id' column auto-increments for each row.
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            full_name TEXT,
+            email TEXT UNIQUE,
+            role TEXT NOT NULL CHECK(role IN ('admin', 'user')),
+            salt TEXT NOT NULL,
+            password_hash TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        """
+    )
+    # Secondary indexes for filtering/sorting by role and signup date.
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_users_role ON users(role);")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_users_created_at ON users(created_at);")
+    # Which shard this file is; the sharded id allocator reads it.
+    cur.execute("CREATE TABLE IF NOT EXISTS shard_info (shard_index INTEGER NOT NULL, shard_count INTEGER NOT NULL);")
+    cur.execute("SELECT shard_index, shard_count FROM shard_info;")
+    info = cur.fetchone()
+    if info is None:
+        cur.execute("INSERT INTO shard_info VALUES (?, ?);", (shard, max(1, SHARD_COUNT)))
+    elif SHARD_COUNT > 1 and tuple(info) != (shard, SHARD_COUNT):
+        raise RuntimeError(
+            f"{shard_db_name(shard)} was created as shard {info[0]} of {info[1]}, "
+            f"but USER_CRUD_SHARDS={SHARD_COUNT}. Re-sharding is not supported."
+        )
+    conn.commit()
+    init_search_index(conn)
+    init_change_log(conn)
+
+    cur.execute("SELECT COUNT(*) AS c FROM users WHERE role = 'admin';")
+    return cur.fetchone()["c"]
+
+
+def init_search_index(conn: sqlite3.Connection) -> None:
+    """
+    Create the users_fts full-text index (SQLite FTS5) and the triggers that
+    keep it in sync with the users table. An existing users table is indexed
+    once, the first time this runs. If this SQLite build has no FTS5,
+    search_users() falls back to a slower LIKE search.
+    """
+    cur = conn.cursor()
+    cur.execute("SELECT 1 FROM sqlite_master WHERE name = 'users_fts';")
+    if cur.fetchone() is not None:
+        return
+    try:
+        # External-content table: the text lives in users, FTS stores only the index.
+        # prefix='2 3' pre-builds short-prefix indexes so "jo*" style searches stay fast.
+        cur.executescript(
+            """
+            CREATE VIRTUAL TABLE users_fts USING fts5(
+                username, full_name, email,
+                content='users', content_rowid='id', prefix='2 3'
+            );
+            CREATE TRIGGER users_fts_insert AFTER INSERT ON users BEGIN
+                INSERT INTO users_fts(rowid, username, full_name, email)
+                VALUES (new.id, new.username, new.full_name, new.email);
+            END;
+            CREATE TRIGGER users_fts_delete AFTER DELETE ON users BEGIN
+                INSERT INTO users_fts(users_fts, rowid, username, full_name, email)
+                VALUES ('delete', old.id, old.username, old.full_name, old.email);
+            END;
+            CREATE TRIGGER users_fts_update AFTER UPDATE OF username, full_name, email ON users BEGIN
+                INSERT INTO users_fts(users_fts, rowid, username, full_name, email)
+                VALUES ('delete', old.id, old.username, old.full_name, old.email);
+                INSERT INTO users_fts(rowid, username, full_name, email)
+                VALUES (new.id, new.username, new.full_name, new.email);
+            END;
+            INSERT INTO users_fts(users_fts) VALUES ('rebuild');
+            """
+        )
+    except sqlite3.OperationalError as e:
+        # e.g. "no such module: fts5" on a minimal SQLite build
+        print(f"[SETUP] Full-text search unavailable ({e}); using slower LIKE search.")
+
+
+def init_change_log(conn: sqlite3.Connection) -> None:
+    """
+    Create the append-only user_changes log and the triggers that fill it.
+    Every insert/update/delete on users adds one row with an increasing `seq`,
+    so a mirror only needs the rows after the last seq it has applied.
+    `data` is a JSON snapshot of the row (never the salt or password hash).
+    """
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS user_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            op TEXT NOT NULL CHECK(op IN ('insert', 'update', 'delete')),
+            user_id INTEGER NOT NULL,
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            data TEXT
+        );
+        CREATE TRIGGER IF NOT EXISTS user_changes_insert AFTER INSERT ON users BEGIN
+            INSERT INTO user_changes (op, user_id, data)
+            VALUES ('insert', new.id, json_object(
+                'id', new.id, 'username', new.username, 'full_name', new.full_name,
+                'email', new.email, 'role', new.role, 'created_at', new.created_at));
+        END;
+        CREATE TRIGGER IF NOT EXISTS user_changes_update AFTER UPDATE ON users BEGIN
+            INSERT INTO user_changes (op, user_id, data)
+            VALUES ('update', new.id, json_object(
+                'id', new.id, 'username', new.username, 'full_name', new.full_name,
+                'email', new.email, 'role', new.role, 'created_at', new.created_at,
+                'password_changed', json(CASE WHEN new.password_hash IS old.password_hash
+                                              THEN 'false' ELSE 'true' END)));
+        END;
+        CREATE TRIGGER IF NOT EXISTS user_changes_delete AFTER DELETE ON users BEGIN
+            INSERT INTO user_changes (op, user_id, data)
+            VALUES ('delete', old.id, json_object('id', old.id, 'username', old.username));
+        END;
+        """
+    )
+
+
+# ---------- User Cache ----------
+
+class UserCache:
+    """
+    Read-through LRU cache for full user rows, reachable by id or by username.
+    Entries expire after `ttl` seconds so changes made by other processes are
+    picked up eventually; changes made through this module invalidate at once.
+
+    Every invalidate()/clear() bumps a generation counter. A reader takes
+    generation() before its SELECT and hands it to put(); if a write was
+    invalidated in between, the row it read may be stale and is not cached.
+    Password checks and session checks must not use the cache at all (see
+    authenticate() and verified_session()), so what it serves is the admin
+    view-by-id screen and the server's GET /users/<id>.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._rows: "OrderedDict[int, Tuple[float, sqlite3.Row]]" = OrderedDict()
+        self._ids_by_username: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get_by_id(self, user_id: int) -> Optional[sqlite3.Row]:
+        with self._lock:
+            return self._get(user_id)
+
+    def get_by_username(self, username: str) -> Optional[sqlite3.Row]:
+        with self._lock:
+            user_id = self._ids_by_username.get(username)
+            if user_id is None:
+                self.misses += 1
+                return None
+            return self._get(user_id)
+
+    def _get(self, user_id: int) -> Optional[sqlite3.Row]:
+        entry = self._rows.get(user_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        stored_at, row = entry
+        if time.monotonic() - stored_at > self.ttl:
+            self._drop(user_id)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._rows.move_to_end(user_id)
+        self.hits += 1
+        return row
+
+    def generation(self) -> int:
+        """Take this before reading a row from the database; pass it to put()."""
+        return self._generation
+
+    def put(self, row: sqlite3.Row, generation: Optional[int] = None) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return  # something was invalidated after this row was read
+            self._drop(row["id"])
+            self._rows[row["id"]] = (time.monotonic(), row)
+            self._ids_by_username[row["username"]] = row["id"]
+            while len(self._rows) > self.max_size:
+                oldest_id = next(iter(self._rows))
+                self._drop(oldest_id)
+                self.evictions += 1
+
+    def invalidate(self, user_id: Optional[int] = None, username: Optional[str] = None) -> None:
+        """Forget a user by id and/or username (unknown keys are ignored)."""
+        with self._lock:
+            self._generation += 1
+            if username is not None and user_id is None:
+                user_id = self._ids_by_username.get(username)
+            if user_id is not None:
+                self._drop(user_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._rows.clear()
+            self._ids_by_username.clear()
+
+    def _drop(self, user_id: int) -> None:
+        entry = self._rows.pop(user_id, None)
+        if entry is not None:
+            self._ids_by_username.pop(entry[1]["username"], None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for sizing the cache: hits, misses, evictions, expirations, size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._rows),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+user_cache = UserCache(
+    max_size=int(os.getenv("USER_CRUD_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("USER_CRUD_CACHE_TTL", "30")),
+)
+
+
 # ---------- CRUD Operations (Admin) ----------
 
+@instrumented("create_user")
 def create_user(username: str, full_name: str, email: str, role: str, password: str) -> int:
     """Create a new user and return the new user's ID."""
     if role not in ("admin", "user"):
         raise ValueError("Role must be 'admin' or 'user'.")
 
     salt, password_hash = hash_password(password)
-    with get_connection() as conn:
+    with unique_email(email.strip()), get_connection(db_for_username(username.strip())) as conn:
         cur = conn.cursor()
         cur.execute(
-            """
-            INSERT INTO users (username, full_name, email, role, salt, password_hash)
-            VALUES (?, ?, ?, ?, ?, ?);
-            """,
+            insert_user_sql(),
             (username.strip(), full_name.strip(), email.strip(), role, salt, password_hash),
         )
         conn.commit()
-        return cur.lastrowid  # The auto-allocated ID
+    user_cache.invalidate(username=username.strip())
+    return cur.lastrowid  # The auto-allocated ID
 from typing import Any, Optional
 
-def read_user_by_username(username: str) -> Optional[sqlite3.Row]:
-    """Fetch a user by username (or return None if missing)."""
-    with get_connection() as conn:
+@instrumented("read_user_by_username")
+def read_user_by_username(username: str, use_cache: bool = True) -> Optional[sqlite3.Row]:
+    """
+    Fetch a user by username (or return None if missing).
+    use_cache=False always reads the database (for password and session checks).
+    """
+    username = username.strip()
+    if use_cache:
+        row = user_cache.get_by_username(username)
+        if row is not None:
+            return row
+    generation = user_cache.generation()
+    with get_connection(db_for_username(username)) as conn:
         cur = conn.cursor()
-        cur.execute("SELECT * FROM users WHERE username = ?;", (username.strip(),))
+        cur.execute("SELECT * FROM users WHERE username = ?;", (username,))
         row = cur.fetchone()
-        return row
+    if row is not None:
+        user_cache.put(row, generation)
+    return row
 
 
-def read_user_by_id(user_id: int) -> Optional[sqlite3.Row]:
-    """Fetch a user by ID (or return None if missing)."""
-    with get_connection() as conn:
+@instrumented("read_user_by_id")
+def read_user_by_id(user_id: int, use_cache: bool = True) -> Optional[sqlite3.Row]:
+    """
+    Fetch a user by ID (or return None if missing).
+    use_cache=False always reads the database (for password and session checks).
+    """
+    if use_cache:
+        row = user_cache.get_by_id(user_id)
+        if row is not None:
+            return row
+    generation = user_cache.generation()
+    with get_connection(db_for_id(user_id)) as conn:
         cur = conn.cursor()
         cur.execute("SELECT * FROM users WHERE id = ?;", (user_id,))
-        return cur.fetchone()
+        row = cur.fetchone()
+    if row is not None:
+        user_cache.put(row, generation)
+    return row
 
 
+@instrumented("list_users")
 def list_users() -> list[sqlite3.Row]:
     """Return all users sorted by ID."""
-    with get_connection() as conn:
-        cur = conn.cursor()
-        cur.execute("SELECT id, username, full_name, email, role, created_at FROM users ORDER BY id;")
-        return cur.fetchall()
+    per_shard = []
+    for db_name in all_db_names():
+        with get_connection(db_name) as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT id, username, full_name, email, role, created_at FROM users ORDER BY id;")
+            per_shard.append(cur.fetchall())
+    if len(per_shard) == 1:
+        return per_shard[0]
+    return list(heapq.merge(*per_shard, key=lambda row: row["id"]))
+
+
+USER_LIST_COLUMNS = "id, username, full_name, email, role, created_at"
+USER_PAGE_SIZE = 500
+
+
+def _filter_clause(filters: Optional[Dict[str, Any]]) -> Tuple[list[str], list[Any]]:
+    """
+    Turn a filters dict into SQL conditions + params. Supported keys:
+        role            — 'admin' or 'user'
+        created_after   — 'YYYY-MM-DD[ HH:MM:SS]', inclusive
+        created_before  — 'YYYY-MM-DD[ HH:MM:SS]', exclusive
+        ids             — only these user ids
+        exclude_ids     — never these user ids
+    """
+    conditions: list[str] = []
+    params: list[Any] = []
+    filters = filters or {}
+    unknown = set(filters) - {"role", "created_after", "created_before", "ids", "exclude_ids"}
+    if unknown:
+        raise ValueError(f"Unknown filter(s): {', '.join(sorted(unknown))}")
+
+    if filters.get("role") is not None:
+        conditions.append("role = ?")
+        params.append(filters["role"])
+    if filters.get("created_after") is not None:
+        conditions.append("created_at >= ?")
+        params.append(filters["created_after"])
+    if filters.get("created_before") is not None:
+        conditions.append("created_at < ?")
+        params.append(filters["created_before"])
+    # Id lists travel as one JSON parameter, so 100k ids are still one statement.
+    if filters.get("ids") is not None:
+        conditions.append("id IN (SELECT value FROM json_each(?))")
+        params.append(json.dumps([int(user_id) for user_id in filters["ids"]]))
+    if filters.get("exclude_ids"):
+        conditions.append("id NOT IN (SELECT value FROM json_each(?))")
+        params.append(json.dumps([int(user_id) for user_id in filters["exclude_ids"]]))
+    return conditions, params
+
+
+def _narrows(filters: Optional[Dict[str, Any]]) -> bool:
+    """True if `filters` pick users by something; exclude_ids alone still matches (nearly) everyone."""
+    return bool(_filter_clause({key: value for key, value in (filters or {}).items() if key != "exclude_ids"})[0])
+
+
+def count_users(filters: Optional[Dict[str, Any]] = None) -> int:
+    """How many users match `filters` (same keys as iter_users)."""
+    conditions, params = _filter_clause(filters)
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    total = 0
+    for db_name in all_db_names():
+        with get_connection(db_name) as conn:
+            total += conn.execute(f"SELECT COUNT(*) FROM users{where};", params).fetchone()[0]
+    return total
+
+
+@instrumented("iter_users")
+def iter_users(
+    after_id: int = 0,
+    page_size: int = USER_PAGE_SIZE,
+    filters: Optional[Dict[str, Any]] = None,
+) -> Iterator[sqlite3.Row]:
+    """
+    Yield users with id > after_id in ID order, fetching `page_size` rows per query.
+    Uses keyset pagination (WHERE id > last_seen_id), so every page is an index
+    seek and memory use stays flat no matter how large the table is.
+    In sharded mode each shard is paged the same way and the streams are merged.
+    """
+    if page_size < 1:
+        raise ValueError("page_size must be at least 1.")
+    conditions, params = _filter_clause(filters)
+    conditions.insert(0, "id > ?")
+    sql = f"SELECT {USER_LIST_COLUMNS} FROM users WHERE {' AND '.join(conditions)} ORDER BY id LIMIT ?;"
+
+    streams = [_iter_pages(db_name, sql, params, after_id, page_size) for db_name in all_db_names()]
+    if len(streams) == 1:
+        return streams[0]
+    return heapq.merge(*streams, key=lambda row: row["id"])
+
+
+def _iter_pages(db_name: str, sql: str, params: list[Any], after_id: int, page_size: int) -> Iterator[sqlite3.Row]:
+    last_id = after_id
+    while True:
+        with get_connection(db_name) as conn:
+            page = conn.execute(sql, (last_id, *params, page_size)).fetchall()
+        yield from page
+        if len(page) < page_size:
+            return
+        last_id = page[-1]["id"]
 
 
+def _fts_query(text: str) -> str:
+    """
+    Turn free text into an FTS5 query: every word becomes a quoted prefix
+    term, all of which must match. 'jo smi' -> '"jo"* "smi"*'
+    """
+    words = text.replace('"', " ").split()
+    return " ".join(f'"{word}"*' for word in words)
+
+
+@instrumented("search_users")
+def search_users(
+    text: str,
+    limit: int = 20,
+    filters: Optional[Dict[str, Any]] = None,
+) -> list[sqlite3.Row]:
+    """
+    Prefix/token search over username, full_name and email, best matches first.
+    'jo' finds 'john', 'Jo Smith' and 'jo.doe@example.com'; 'jo smi' needs both.
+    Accepts the same filters as iter_users().
+    """
+    query = _fts_query(text)
+    if not query:
+        return []
+    conditions, params = _filter_clause(filters)
+    extra = "".join(f" AND {condition}" for condition in conditions)
+
+    db_names = all_db_names()
+    if len(db_names) == 1:
+        return _search_db(db_names[0], text, query, extra, params, limit)
+    # Sharded: best `limit` from each shard, then the best `limit` overall.
+    rows = [row for db_name in db_names for row in _search_db(db_name, text, query, extra, params, limit)]
+    rows.sort(key=lambda row: row["rank"])
+    return rows[:limit]
+
+
+def _search_db(
+    db_name: str,
+    text: str,
+    query: str,
+    extra: str,
+    params: list[Any],
+    limit: int,
+) -> list[sqlite3.Row]:
+    with get_connection(db_name) as conn:
+        try:
+            # CROSS JOIN pins users_fts as the outer loop so MATCH drives the search.
+            return conn.execute(
+                f"""
+                SELECT users.id, users.username, users.full_name, users.email,
+                       users.role, users.created_at, users_fts.rank AS rank
+                FROM users_fts
+                CROSS JOIN users ON users.id = users_fts.rowid
+                WHERE users_fts MATCH ?{extra}
+                ORDER BY users_fts.rank
+                LIMIT ?;
+                """,
+                (query, *params, limit),
+            ).fetchall()
+        except sqlite3.OperationalError as e:
+            if "users_fts" not in str(e):
+                raise
+            # No FTS5 index available: plain prefix match on each column.
+            like = text.strip().replace("%", "").replace("_", "") + "%"
+            return conn.execute(
+                f"""
+                SELECT {USER_LIST_COLUMNS}, 0 AS rank FROM users
+                WHERE (username LIKE ? OR full_name LIKE ? OR email LIKE ?){extra}
+                ORDER BY id
+                LIMIT ?;
+                """,
+                (like, like, like, *params, limit),
+            ).fetchall()
+
+
+@instrumented("update_user")
 def update_user(
     user_id: int,
     full_name: Optional[str] = None,
@@ -208,40 +1194,824 @@ def update_user(
         return  # Nothing to do
 
     params.append(user_id)
-    with get_connection() as conn:
+    with unique_email(email and email.strip(), except_id=user_id), get_connection(db_for_id(user_id)) as conn:
         cur = conn.cursor()
         sql = f"UPDATE users SET {', '.join(updates)} WHERE id = ?;"
         cur.execute(sql, tuple(params))
         conn.commit()
+    user_cache.invalidate(user_id)
+    if new_password is not None:
+        session_store.revoke_user(user_id)  # a new password signs out every session
+    else:
+        session_store.update_user(user_id, {
+            "full_name": full_name and full_name.strip(),
+            "email": email and email.strip(),
+            "role": role,
+        })
 
 
+@instrumented("delete_user")
 def delete_user(user_id: int) -> None:
     """Delete a user by ID."""
-    with get_connection() as conn:
+    with get_connection(db_for_id(user_id)) as conn:
         cur = conn.cursor()
         cur.execute("DELETE FROM users WHERE id = ?;", (user_id,))
         conn.commit()
+    user_cache.invalidate(user_id)
+    session_store.revoke_user(user_id)
+
+
+# Fields update_users() may set on many rows at once. Emails must stay unique
+# and passwords need a salt per user, so those still go through update_user().
+BULK_UPDATE_FIELDS = ("full_name", "role")
+
+
+@instrumented("update_users", rows=lambda count: count)
+def update_users(filters: Dict[str, Any], **fields: Any) -> int:
+    """
+    Set `fields` (full_name and/or role) on every user matching `filters`
+    with a single UPDATE in one transaction. Users that already hold the
+    new values are left alone. Returns how many users changed.
+    Refuses (ValueError) to demote the last remaining admin(s).
+    """
+    unknown = set(fields) - set(BULK_UPDATE_FIELDS)
+    if unknown:
+        raise ValueError(f"Can't bulk-update: {', '.join(sorted(unknown))} (use update_user).")
+    changes = {field: value for field, value in fields.items() if value is not None}
+    if not changes:
+        return 0
+    if "role" in changes and changes["role"] not in ("admin", "user"):
+        raise ValueError("Role must be 'admin' or 'user'.")
+    if "full_name" in changes:
+        changes["full_name"] = changes["full_name"].strip()
+
+    if not _narrows(filters):
+        raise ValueError("Refusing to update every user: give at least one filter.")
+    conditions, params = _filter_clause(filters)
+    if changes.get("role") == "user" and not _admins_outside(conditions, params):
+        raise ValueError("Refusing to demote every admin: at least one must remain.")
+    # skip rows that already hold every new value: no write, no change-log entry
+    conditions.append("(" + " OR ".join(f"{field} IS NOT ?" for field in changes) + ")")
+    params.extend(changes.values())
+    assignments = ", ".join(f"{field} = ?" for field in changes)
+    changed_ids = _run_set_statement(
+        f"UPDATE users SET {assignments} WHERE {' AND '.join(conditions)} RETURNING id;",
+        [*changes.values(), *params],
+    )
+    _forget_users(changed_ids)
+    session_store.update_users(changed_ids, changes)
+    return len(changed_ids)
+
+
+def _admins_outside(conditions: list[str], params: list[Any]) -> int:
+    """How many admins the filter `conditions` do NOT match (summed over shards)."""
+    sql = f"SELECT COUNT(*) FROM users WHERE role = 'admin' AND NOT COALESCE(({' AND '.join(conditions)}), 0);"
+    total = 0
+    for db_name in all_db_names():
+        with get_connection(db_name) as conn:
+            total += conn.execute(sql, params).fetchone()[0]
+    return total
+
+
+@instrumented("delete_users", rows=lambda count: count)
+def delete_users(ids: Optional[Iterable[int]] = None, filters: Optional[Dict[str, Any]] = None) -> int:
+    """
+    Delete the given ids and/or every user matching `filters` with a single
+    DELETE in one transaction. Returns how many users were deleted.
+    """
+    filters = dict(filters or {})
+    if ids is not None:
+        filters["ids"] = list(ids)
+    if not _narrows(filters):
+        raise ValueError("Refusing to delete every user: give ids or at least one filter.")
+    conditions, params = _filter_clause(filters)
+    deleted_ids = _run_set_statement(f"DELETE FROM users WHERE {' AND '.join(conditions)} RETURNING id;", params)
+    _forget_users(deleted_ids)
+    session_store.revoke_users(deleted_ids)
+    return len(deleted_ids)
+
+
+def _run_set_statement(sql: str, params: list[Any]) -> list[int]:
+    """Run one UPDATE/DELETE ... RETURNING id per database file; return the ids it touched."""
+    ids: list[int] = []
+    for db_name in all_db_names():
+        with get_connection(db_name) as conn:
+            ids.extend(row[0] for row in conn.execute(sql, params))
+    return ids
+
+
+def _forget_users(user_ids: list[int]) -> None:
+    """Drop changed users from the cache (or all of it, if that's cheaper)."""
+    if len(user_ids) > user_cache.max_size:
+        user_cache.clear()
+    else:
+        for user_id in user_ids:
+            user_cache.invalidate(user_id)
+
+
+# ---------- Change Feed ----------
+
+CHANGES_PAGE_SIZE = 1000
+
+
+@instrumented("iter_changes")
+def iter_changes(
+    after_seq: int = 0,
+    page_size: int = CHANGES_PAGE_SIZE,
+    shard: Optional[int] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield every logged change with seq > after_seq, oldest first, as dicts:
+    {"seq", "op", "user_id", "changed_at", "data"}. Reads by seq ranges, so the
+    cost depends on how many changes there are, not on the size of users.
+    In sharded mode every shard has its own log and seq, so pass `shard`.
+    """
+    if SHARD_COUNT > 1 and shard is None:
+        raise ValueError(f"Sharded mode: choose a shard (0-{SHARD_COUNT - 1}); each has its own change log.")
+    db_name = shard_db_name(shard or 0)
+    last_seq = after_seq
+    while True:
+        with get_connection(db_name) as conn:
+            page = conn.execute(
+                """
+                SELECT seq, op, user_id, changed_at, data FROM user_changes
+                WHERE seq > ? ORDER BY seq LIMIT ?;
+                """,
+                (last_seq, page_size),
+            ).fetchall()
+        for row in page:
+            yield {
+                "seq": row["seq"],
+                "op": row["op"],
+                "user_id": row["user_id"],
+                "changed_at": row["changed_at"],
+                "data": json.loads(row["data"]) if row["data"] else None,
+            }
+        if len(page) < page_size:
+            return
+        last_seq = page[-1]["seq"]
+
+
+def changes_command(after_seq: int, follow: bool, poll_seconds: float, shard: Optional[int]) -> None:
+    """CLI handler for: python user_crud_cli.py changes --after SEQ [--follow] [--shard K]"""
+    init_db()
+    try:
+        while True:
+            for change in iter_changes(after_seq, shard=shard):
+                print(json.dumps(change), flush=True)
+                after_seq = change["seq"]
+            if not follow:
+                break
+            time.sleep(poll_seconds)
+    except KeyboardInterrupt:
+        pass
+
+
+# ---------- Backup & Export ----------
+
+BACKUP_PAGES_PER_STEP = 1024
+EXPORT_FETCH_SIZE = 1000
+
+
+def backup_db(
+    dest_path: str,
+    pages_per_step: int = BACKUP_PAGES_PER_STEP,
+    sleep_seconds: float = 0.005,
+    show_progress: bool = True,
+) -> Tuple[int, float]:
+    """
+    Copy the live database to dest_path with SQLite's online backup API,
+    `pages_per_step` pages at a time with a short pause in between, so the
+    running program keeps reading and writing while the copy is made.
+    In sharded mode each shard goes to its own file (see backup_paths()).
+    Returns (total_pages, seconds).
+    """
+    start = time.perf_counter()
+    total_pages = 0
+    for source_name, target_name in zip(all_db_names(), backup_paths(dest_path)):
+        total_pages += _backup_file(source_name, target_name, pages_per_step, sleep_seconds, show_progress)
+    return total_pages, time.perf_counter() - start
+
+
+def backup_paths(dest_path: str) -> list[str]:
+    """Backup file name(s): dest_path itself, or one per shard in sharded mode."""
+    if SHARD_COUNT <= 1:
+        return [dest_path]
+    base, ext = os.path.splitext(dest_path)
+    return [f"{base}.shard{shard}{ext}" for shard in range(SHARD_COUNT)]
+
+
+def _backup_file(
+    source_name: str,
+    dest_path: str,
+    pages_per_step: int,
+    sleep_seconds: float,
+    show_progress: bool,
+) -> int:
+    source = sqlite3.connect(source_name)
+    target = sqlite3.connect(dest_path)
+    # Hold one read transaction for the whole copy. In WAL mode that pins a
+    # snapshot, so commits from other connections neither block us nor force
+    # the backup to restart from page 1 (which it otherwise does on every write).
+    source.execute("BEGIN;")
+    source.execute("SELECT COUNT(*) FROM sqlite_master;").fetchone()
+    total_pages = 0
+
+    def progress(status: int, remaining: int, total: int) -> None:
+        nonlocal total_pages
+        total_pages = total
+        if show_progress:
+            print(f"\r  copied {total - remaining}/{total} pages", end="", flush=True)
+
+    try:
+        source.backup(target, pages=pages_per_step, progress=progress, sleep=sleep_seconds)
+    finally:
+        target.close()
+        source.close()
+    if show_progress:
+        print()
+    return total_pages
+
+
+def export_users(path: str, fmt: Optional[str] = None) -> Tuple[int, float]:
+    """
+    Stream the users table (no salts/hashes) to CSV or JSONL, gzipped if the
+    path ends in .gz. Rows are fetched EXPORT_FETCH_SIZE at a time inside one
+    read transaction: the file is a consistent snapshot, memory stays flat,
+    and (thanks to WAL) writers are never blocked. In sharded mode every
+    shard is read the same way and merged by id. Returns (rows, seconds).
+    """
+    base = path[:-3] if path.lower().endswith(".gz") else path
+    if fmt is None:
+        fmt = "jsonl" if base.lower().endswith((".jsonl", ".ndjson")) else "csv"
+    if fmt not in ("csv", "jsonl"):
+        raise ValueError("Export format must be 'csv' or 'jsonl'.")
+    opener = gzip.open if path.lower().endswith(".gz") else open
+    columns = [name.strip() for name in USER_LIST_COLUMNS.split(",")]
+
+    start = time.perf_counter()
+    rows_written = 0
+    # Own connections so the long read transactions don't tie up the pooled ones.
+    conns = [sqlite3.connect(db_name) for db_name in all_db_names()]
+    try:
+        streams = []
+        for conn in conns:
+            conn.execute("BEGIN;")  # snapshot starts at the first read
+            cur = conn.execute(f"SELECT {USER_LIST_COLUMNS} FROM users ORDER BY id;")
+            streams.append(_fetch_in_batches(cur))
+        rows = streams[0] if len(streams) == 1 else heapq.merge(*streams, key=lambda row: row[0])
+
+        with opener(path, "wt", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file) if fmt == "csv" else None
+            if writer:
+                writer.writerow(columns)
+            for row in rows:
+                if writer:
+                    writer.writerow(row)
+                else:
+                    file.write(json.dumps(dict(zip(columns, row))) + "\n")
+                rows_written += 1
+        for conn in conns:
+            conn.execute("COMMIT;")
+    finally:
+        for conn in conns:
+            conn.close()
+    return rows_written, time.perf_counter() - start
+
+
+def _fetch_in_batches(cur: sqlite3.Cursor) -> Iterator[tuple]:
+    while True:
+        batch = cur.fetchmany(EXPORT_FETCH_SIZE)
+        if not batch:
+            return
+        yield from batch
+
+
+def backup_command(dest_path: str, pages_per_step: int) -> None:
+    """CLI handler for: python user_crud_cli.py backup DEST"""
+    init_db()
+    pages, seconds = backup_db(dest_path, pages_per_step=pages_per_step)
+    size_mb = sum(os.path.getsize(path) for path in backup_paths(dest_path)) / (1024 * 1024)
+    rate = size_mb / seconds if seconds > 0 else 0.0
+    print(f"Backup written to {dest_path}: {pages} pages, {size_mb:.1f} MB in {seconds:.2f}s ({rate:.1f} MB/sec).")
+
+
+def export_command(path: str, fmt: Optional[str]) -> None:
+    """CLI handler for: python user_crud_cli.py export PATH"""
+    init_db()
+    rows, seconds = export_users(path, fmt)
+    rate = rows / seconds if seconds > 0 else 0.0
+    print(f"Exported {rows} user(s) to {path} in {seconds:.2f}s ({rate:,.0f} rows/sec).")
+
+
+# ---------- Bulk Import ----------
+
+BULK_FIELDS = ("username", "full_name", "email", "role", "password")
+BULK_BATCH_SIZE = 5000
+
+
+@instrumented("create_users_bulk", rows=lambda result: result[0])
+def create_users_bulk(
+    users: Iterable[Dict[str, Any]],
+    batch_size: int = BULK_BATCH_SIZE,
+) -> Tuple[int, list[Tuple[int, str, str]]]:
+    """
+    Insert many users, `batch_size` rows per transaction.
+    `users` is any iterable of dicts with the BULK_FIELDS keys (it is consumed lazily).
+
+    Returns (inserted_count, problems) where problems is a list of
+    (row_number, username, error_message) for rows that were skipped,
+    e.g. UNIQUE conflicts or a bad role. One bad row never aborts its batch.
+    """
+    inserted = 0
+    problems: list[Tuple[int, str, str]] = []
+    batch: list[Tuple[int, tuple]] = []
+
+    for row_number, record in enumerate(users, start=1):
+        username = str(record.get("username") or "").strip()
+        role = str(record.get("role") or "user").strip().lower()
+        password = str(record.get("password") or "")
+        if not username or not password:
+            problems.append((row_number, username, "username and password are required"))
+            continue
+        if role not in ("admin", "user"):
+            problems.append((row_number, username, "Role must be 'admin' or 'user'."))
+            continue
+
+        params = (
+            username,
+            str(record.get("full_name") or "").strip(),
+            str(record.get("email") or "").strip() or None,
+            role,
+            password,
+        )
+        batch.append((row_number, params))
+        if len(batch) >= batch_size:
+            inserted += _insert_batch(_hash_batch(batch), problems)
+            batch = []
+
+    if batch:
+        inserted += _insert_batch(_hash_batch(batch), problems)
+    problems.sort()
+    return inserted, problems
+
+
+def _hash_batch(batch: list[Tuple[int, tuple]]) -> list[Tuple[int, tuple]]:
+    """Swap the plain password at the end of each row for (salt, hash), hashing in parallel."""
+    hashed = hashing_service.hash_many([params[-1] for _, params in batch])
+    return [
+        (row_number, params[:-1] + salt_and_hash)
+        for (row_number, params), salt_and_hash in zip(batch, hashed)
+    ]
+
+
+def _insert_batch(
+    batch: list[Tuple[int, tuple]],
+    problems: list[Tuple[int, str, str]],
+) -> int:
+    """Split a batch by shard (a no-op unless sharding is on) and insert each part."""
+    if SHARD_COUNT > 1:
+        with email_lock().exclusive():
+            return _insert_sharded_batch(batch, problems)
+    return _insert_db_batch(DB_NAME, batch, problems)
+
+
+def _insert_sharded_batch(
+    batch: list[Tuple[int, tuple]],
+    problems: list[Tuple[int, str, str]],
+) -> int:
+    """Drop rows whose email another shard (or an earlier row) has, then insert per shard."""
+    taken = emails_taken(params[2] for _, params in batch if params[2])
+    by_db: Dict[str, list[Tuple[int, tuple]]] = {}
+    for row_number, params in batch:
+        email = params[2]
+        if email and email in taken:
+            problems.append((row_number, params[0], "UNIQUE constraint failed: users.email"))
+            continue
+        if email:
+            taken.add(email)
+        by_db.setdefault(db_for_username(params[0]), []).append((row_number, params))
+    return sum(_insert_db_batch(db_name, rows, problems) for db_name, rows in by_db.items())
+
+
+def _insert_db_batch(
+    db_name: str,
+    batch: list[Tuple[int, tuple]],
+    problems: list[Tuple[int, str, str]],
+) -> int:
+    """
+    Insert one batch in a single transaction and return how many rows went in.
+    Fast path: one executemany. If any row violates a constraint, only that
+    batch is replayed row by row (same transaction) to find the culprits.
+    """
+    sql = insert_user_sql()
+    with get_connection(db_name) as conn:
+        conn.execute("SAVEPOINT bulk_batch;")
+        try:
+            conn.executemany(sql, [params for _, params in batch])
+            conn.execute("RELEASE SAVEPOINT bulk_batch;")
+            return len(batch)
+        except sqlite3.IntegrityError:
+            conn.execute("ROLLBACK TO SAVEPOINT bulk_batch;")
+            conn.execute("RELEASE SAVEPOINT bulk_batch;")
+
+        inserted = 0
+        for row_number, params in batch:
+            try:
+                conn.execute(sql, params)
+                inserted += 1
+            except sqlite3.IntegrityError as e:
+                problems.append((row_number, params[0], str(e)))
+        return inserted
+
+
+def read_user_records(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Stream user records from a .csv (with a header row) or .jsonl file,
+    one dict at a time, so huge files never sit in memory.
+    """
+    with open(path, "r", newline="", encoding="utf-8") as file:
+        if path.lower().endswith((".jsonl", ".ndjson")):
+            for line in file:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(file)
+
+
+def import_users_command(path: str, batch_size: int) -> None:
+    """CLI handler for: python user_crud_cli.py import FILE"""
+    init_db()
+    start = time.perf_counter()
+    inserted, problems = create_users_bulk(read_user_records(path), batch_size=batch_size)
+    elapsed = time.perf_counter() - start
+
+    for row_number, username, error in problems:
+        print(f"Row {row_number} ({username or '?'}): {error}")
+    rate = inserted / elapsed if elapsed > 0 else 0.0
+    print(f"\nImported {inserted} user(s), skipped {len(problems)} in {elapsed:.2f}s ({rate:,.0f} rows/sec).")
+
+
+# ---------- Assistant (optional) ----------
+
+ASSISTANT_BACKEND = os.getenv("USER_CRUD_ASSISTANT", "stub")
+ASSISTANT_MODEL = os.getenv("USER_CRUD_ASSISTANT_MODEL", "gpt-5")
+ASSISTANT_CACHE_FILE = "assistant_cache.json"
+
+
+class AssistantBackend(ABC):
+    """Interface for assistant backends: turn a prompt into a reply."""
+
+    name = "base"
+
+    @abstractmethod
+    def reply(self, prompt: str) -> str:
+        ...
+
+
+class StubAssistant(AssistantBackend):
+    """Offline backend: answers instantly without any network access."""
+
+    name = "stub"
+
+    def reply(self, prompt: str) -> str:
+        return f"(offline assistant) I can't look that up right now, but you asked: {prompt!r}"
+
+
+class OpenAIAssistant(AssistantBackend):
+    """OpenAI chat backend. The openai package is only imported on first use."""
+
+    name = "openai"
+
+    def __init__(self, model: str):
+        self.model = model
+        self._client = None
+
+    def reply(self, prompt: str) -> str:
+        if self._client is None:
+            from openai import OpenAI  # optional dependency, imported lazily
+            self._client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        response = self._client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+        )
+        return response.choices[0].message.content
+
+
+# name -> factory. Add your own with ASSISTANT_BACKENDS["mine"] = MyBackend
+ASSISTANT_BACKENDS: Dict[str, Callable[[], AssistantBackend]] = {
+    "stub": StubAssistant,
+    "openai": lambda: OpenAIAssistant(ASSISTANT_MODEL),
+}
+
+
+class CachedAssistant:
+    """Wraps a backend with an on-disk JSON cache of previous answers."""
+
+    def __init__(self, backend: AssistantBackend, cache_path: str):
+        self.backend = backend
+        self.cache_path = cache_path
+        self._cache: Optional[Dict[str, str]] = None
+        self._lock = threading.Lock()
+
+    def _key(self, prompt: str) -> str:
+        model = getattr(self.backend, "model", "")
+        return hashlib.sha256(f"{self.backend.name}\0{model}\0{prompt}".encode("utf-8")).hexdigest()
+
+    def _load(self) -> Dict[str, str]:
+        if self._cache is None:
+            try:
+                with open(self.cache_path, "r", encoding="utf-8") as file:
+                    self._cache = json.load(file)
+            except (FileNotFoundError, json.JSONDecodeError):
+                self._cache = {}
+        return self._cache
+
+    def ask(self, prompt: str) -> str:
+        key = self._key(prompt)
+        with self._lock:
+            cached = self._load().get(key)
+        if cached is not None:
+            return cached
+
+        answer = self.backend.reply(prompt)
+        with self._lock:
+            self._load()[key] = answer
+            # Write to a temp file of our own (other processes may be saving too)
+            # and swap it in so a crash never leaves half a cache.
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.cache_path)),
+                                            prefix=os.path.basename(self.cache_path) + ".")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as file:
+                    json.dump(self._cache, file)
+                os.chmod(tmp_path, 0o644)  # mkstemp makes it owner-only
+                os.replace(tmp_path, self.cache_path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        return answer
+
+
+_assistant: Optional[CachedAssistant] = None
+
+
+def get_assistant() -> CachedAssistant:
+    """Build the configured assistant on first use."""
+    global _assistant
+    if _assistant is None:
+        if ASSISTANT_BACKEND not in ASSISTANT_BACKENDS:
+            raise ValueError(
+                f"Unknown assistant backend {ASSISTANT_BACKEND!r}; "
+                f"choose from: {', '.join(ASSISTANT_BACKENDS)}"
+            )
+        _assistant = CachedAssistant(ASSISTANT_BACKENDS[ASSISTANT_BACKEND](), ASSISTANT_CACHE_FILE)
+    return _assistant
+
+
+def ask_assistant(prompt: str) -> None:
+    """Print the assistant's answer, or a short error if the backend fails."""
+    try:
+        print(f"\n{get_assistant().ask(prompt)}\n")
+    except Exception as e:  # network down, missing package, bad key, ...
+        print(f"Assistant unavailable: {e}")
+
+
+# ---------- Sessions ----------
+
+SESSION_TTL = float(os.getenv("USER_CRUD_SESSION_TTL", "1800"))  # idle seconds before a session expires
+SESSION_SWEEP_SECONDS = 60.0
+SESSION_FILE = os.getenv("USER_CRUD_SESSION_FILE")  # unset = sessions live in memory only
+SESSION_FIELDS = ("id", "username", "full_name", "email", "role", "created_at")
+
+
+def credential_tag(user: Any) -> str:
+    """Short fingerprint of a user's password hash; changes whenever the password does."""
+    return hashlib.blake2b(user["password_hash"].encode("utf-8"), digest_size=8).hexdigest()
+
+
+class Session:
+    """One logged-in user: a snapshot of their public fields plus expiry."""
+
+    __slots__ = ("token", "user", "expires_at", "credential")
+
+    def __init__(self, token: str, user: Dict[str, Any], expires_at: float, credential: Optional[str] = None):
+        self.token = token
+        self.user = user
+        self.expires_at = expires_at
+        self.credential = credential
+
+
+class SessionStore:
+    """
+    Token -> Session dict with sliding TTL expiry. A daemon thread sweeps out
+    expired sessions; if `path` is set, sessions are saved there (atomically)
+    whenever one is added or removed, and loaded back on start.
+
+    The store is per process and `path` is owned by one process: each save
+    rewrites the file from this process's dict. Changes made by other
+    processes are picked up through verified_session(), not through here.
+    """
+
+    def __init__(self, ttl: float, path: Optional[str] = None, sweep_seconds: float = SESSION_SWEEP_SECONDS):
+        self.ttl = ttl
+        self.path = path
+        self.sweep_seconds = sweep_seconds
+        self._sessions: Dict[str, Session] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sweeper: Optional[threading.Thread] = None
+        self._loaded = False
+
+    def create(self, user: Any) -> str:
+        """Start a session for a user row and return its token."""
+        self._load()
+        token = secrets.token_urlsafe(32)
+        session = Session(token, {field: user[field] for field in SESSION_FIELDS}, time.time() + self.ttl,
+                          credential_tag(user))
+        with self._lock:
+            self._sessions[token] = session
+            self._save()
+        self._start_sweeper()
+        return token
+
+    def get(self, token: Optional[str]) -> Optional[Session]:
+        """Return the live session for token (and push its expiry back), or None."""
+        if not self._loaded:
+            self._load()
+        session = self._sessions.get(token) if token else None
+        if session is None:
+            return None
+        now = time.time()
+        if session.expires_at <= now:
+            self.revoke(token)
+            return None
+        session.expires_at = now + self.ttl
+        return session
+
+    def revoke(self, token: str) -> None:
+        with self._lock:
+            if self._sessions.pop(token, None) is not None:
+                self._save()
+
+    def revoke_user(self, user_id: int) -> None:
+        """End every session belonging to user_id (password change, delete)."""
+        self.revoke_users([user_id])
+
+    def revoke_users(self, user_ids: Iterable[int]) -> None:
+        user_ids = set(user_ids)
+        self._load()
+        if not user_ids or not self._sessions:
+            return
+        with self._lock:
+            tokens = [token for token, session in self._sessions.items() if session.user["id"] in user_ids]
+            for token in tokens:
+                del self._sessions[token]
+            if tokens:
+                self._save()
+
+    def update_user(self, user_id: int, changes: Dict[str, Any]) -> None:
+        """Apply profile edits to that user's open sessions (None = unchanged)."""
+        self.update_users([user_id], changes)
+
+    def update_users(self, user_ids: Iterable[int], changes: Dict[str, Any]) -> None:
+        changes = {field: value for field, value in changes.items() if value is not None}
+        self._load()
+        if not changes or not self._sessions:
+            return
+        user_ids = set(user_ids)
+        with self._lock:
+            for session in self._sessions.values():
+                if session.user["id"] in user_ids:
+                    session.user.update(changes)
+
+    def sweep(self) -> int:
+        """Drop expired sessions and return how many were removed."""
+        now = time.time()
+        with self._lock:
+            expired = [token for token, session in self._sessions.items() if session.expires_at <= now]
+            for token in expired:
+                del self._sessions[token]
+            if expired:
+                self._save()
+        return len(expired)
+
+    def _start_sweeper(self) -> None:
+        if self._sweeper is None or not self._sweeper.is_alive():
+            self._sweeper = threading.Thread(target=self._sweep_loop, name="session-sweeper", daemon=True)
+            self._sweeper.start()
+
+    def _sweep_loop(self) -> None:
+        while not self._stop.wait(self.sweep_seconds):
+            self.sweep()
+
+    def close(self) -> None:
+        self._stop.set()
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            if not self.path:
+                return
+            try:
+                with open(self.path, "r", encoding="utf-8") as file:
+                    saved = json.load(file)
+            except (FileNotFoundError, json.JSONDecodeError):
+                return
+            now = time.time()
+            for token, (user, expires_at, *credential) in saved.items():
+                if expires_at > now:
+                    self._sessions[token] = Session(token, user, expires_at, *credential)
+        if self._sessions:
+            self._start_sweeper()
+
+    def _save(self) -> None:
+        """Write all sessions to self.path (caller holds the lock)."""
+        if not self.path:
+            return
+        data = {token: [session.user, session.expires_at, session.credential]
+                for token, session in self._sessions.items()}
+        # Owner-only (mkstemp) temp file, swapped in so a crash never leaves a half-written file.
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)),
+                                        prefix=os.path.basename(self.path) + ".")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as file:
+                json.dump(data, file)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+session_store = SessionStore(SESSION_TTL, SESSION_FILE)
+atexit.register(session_store.close)
+
+
+def verified_session(token: Optional[str]) -> Optional[Session]:
+    """
+    Like session_store.get(), but re-reads the user's row from the database
+    (never the cache): if the user was deleted or their password changed -
+    possibly by another process - the session is revoked and None returned;
+    otherwise the session picks up their current role and profile.
+    """
+    session = session_store.get(token)
+    if session is None:
+        return None
+    user = read_user_by_id(session.user["id"], use_cache=False)
+    if user is None or credential_tag(user) != session.credential:
+        session_store.revoke(session.token)
+        return None
+    session.user.update({field: user[field] for field in SESSION_FIELDS})
+    return session
 
 
 # ---------- Authentication & Menus ----------
 
-def login() -> Optional[sqlite3.Row]:
-    """Prompt for username & password and return the user row if valid."""
+@instrumented("authenticate")
+def authenticate(username: str, password: str) -> Optional[sqlite3.Row]:
+    """
+    Return the user row if the username/password pair is valid, else None.
+    The check runs on the hashing service; legacy or outdated hashes are
+    transparently re-hashed with the current scheme on success.
+    The row is read from the database, never the cache: a cached salt/hash
+    could still accept a password changed, or a user deleted, elsewhere.
+    """
+    user = read_user_by_username(username, use_cache=False)
+    if user is None:
+        return None
+    if not hashing_service.verify(password, user["salt"], user["password_hash"]):
+        return None
+    if needs_rehash(user["password_hash"]):
+        update_user(user["id"], new_password=password)
+        user = read_user_by_id(user["id"], use_cache=False)
+    return user
+
+
+def login() -> Optional[str]:
+    """Prompt for username & password and return a session token if valid."""
     print("\n=== Login ===")
     username = input("Username: ").strip()
     password = getpass.getpass("Password: ").strip()
 
-    user = read_user_by_username(username)
+    user = authenticate(username, password)
     if user is None:
         print("Invalid username or password.\n")
         return None
 
-    if verify_password(password, user["salt"], user["password_hash"]):
-        print(f"\nWelcome, {user['username']}! (role: {user['role']})\n")
-        return user
+    print(f"\nWelcome, {user['username']}! (role: {user['role']})\n")
+    return session_store.create(user)
+
 
-    print("Invalid username or password.\n")
-    return None
+def current_session(token: str) -> Optional[Session]:
+    """Look up (and re-check) the menu's session; tell the user if it has ended."""
+    session = verified_session(token)
+    if session is None:
+        print("Your session has ended. Please log in again.\n")
+    return session
 
 
 def prompt_nonempty(prompt: str, allow_skip: bool = False) -> Optional[str]:
@@ -257,9 +2027,43 @@ def prompt_nonempty(prompt: str, allow_skip: bool = False) -> Optional[str]:
         print("Please enter a value.")
 
 
-def admin_menu() -> None:
+def prompt_filters() -> Dict[str, Any]:
+    """Ask for the filters the bulk admin options work on (Enter skips each one)."""
+    filters: Dict[str, Any] = {}
+    role = input("Only role 'admin'/'user' (Enter for any): ").strip().lower()
+    if role in ("admin", "user"):
+        filters["role"] = role
+    before = input("Created before YYYY-MM-DD (Enter for any): ").strip()
+    if before:
+        filters["created_before"] = before
+    after = input("Created on/after YYYY-MM-DD (Enter for any): ").strip()
+    if after:
+        filters["created_after"] = after
+    return filters
+
+
+SCREEN_PAGE_SIZE = 20
+
+
+def show_users_paged(rows: Iterable[sqlite3.Row]) -> None:
+    """Print users SCREEN_PAGE_SIZE at a time, asking before each next page."""
+    shown = 0
+    for row in rows:
+        print(f"ID={row['id']} | {row['username']} | {row['full_name']} | {row['email']} | role={row['role']} | created={row['created_at']}")
+        shown += 1
+        if shown % SCREEN_PAGE_SIZE == 0:
+            if input("-- Enter for next page, 'q' to stop: ").strip().lower() == "q":
+                return
+    if shown == 0:
+        print("No users found.")
+
+
+def admin_menu(token: str) -> None:
     """Display the admin menu loop."""
     while True:
+        session = current_session(token)
+        if session is None or session.user["role"] != "admin":
+            break
         print("""
 ==== Admin Menu ====
 1) Create user
@@ -268,6 +2072,10 @@ def admin_menu() -> None:
 4) Update user by ID
 5) Delete user by ID
 6) Change my admin password
+7) Search users
+8) Ask the assistant
+9) Bulk update users (role / name)
+10) Bulk delete users
 0) Logout
 """)
         choice = input("Choose an option: ").strip()
@@ -291,8 +2099,9 @@ def admin_menu() -> None:
 
         elif choice == "2":
             print("\n-- All Users --")
-            for row in list_users():
-                print(f"ID={row['id']} | {row['username']} | {row['full_name']} | {row['email']} | role={row['role']} | created={row['created_at']}")
+            role_filter = input("Only role 'admin'/'user' (Enter for all): ").strip().lower()
+            filters = {"role": role_filter} if role_filter in ("admin", "user") else None
+            show_users_paged(iter_users(filters=filters))
 
         elif choice == "3":
             try:
@@ -353,9 +2162,7 @@ def admin_menu() -> None:
 
         elif choice == "6":
             print("\n-- Change My Admin Password --")
-            current_username = "admin"  # Minimal demo: assume admin is changing own password
-            # If you have multiple admins, you can ask for username here or track the logged-in admin name.
-            user = read_user_by_username(current_username)
+            user = read_user_by_id(session.user["id"], use_cache=False)
             if user is None:
                 print("Admin user not found.")
                 continue
@@ -365,20 +2172,111 @@ def admin_menu() -> None:
                 continue
             new_pw = getpass.getpass("New password: ").strip()
             update_user(user["id"], new_password=new_pw)
+            # the change signed out every old session; the new one needs the new hash
+            token = session_store.create(read_user_by_id(user["id"], use_cache=False))
             print("Password changed.")
 
+        elif choice == "7":
+            print("\n-- Search Users --")
+            text = prompt_nonempty("Name, username or email (prefix ok): ")
+            results = search_users(text, limit=SCREEN_PAGE_SIZE)
+            show_users_paged(results)
+
+        elif choice == "8":
+            ask_assistant(prompt_nonempty("Your question: "))
+
+        elif choice == "9":
+            print("\n-- Bulk Update Users --")
+            filters = prompt_filters()
+            if not filters:
+                print("Choose at least one filter.")
+                continue
+            filters["exclude_ids"] = [session.user["id"]]  # never change yourself
+            role = None
+            while role not in (None, "admin", "user"):
+                role = input("New role for all of them ('admin'/'user', Enter to keep): ").strip().lower() or None
+            full_name = prompt_nonempty("New full name for all of them (Enter to keep): ", allow_skip=True)
+            if role is None and full_name is None:
+                print("Nothing to change.")
+                continue
+            summary = ", ".join(f"{field}='{value}'" for field, value in (("role", role), ("full_name", full_name))
+                                if value is not None)
+            matched = count_users(filters)
+            if input(f"Set {summary} on {matched} user(s)? (y/N): ").strip().lower() == "y":
+                try:
+                    print(f"Updated {update_users(filters, role=role, full_name=full_name)} user(s).")
+                except ValueError as e:
+                    print(f"Error: {e}")
+            else:
+                print("Update cancelled.")
+
+        elif choice == "10":
+            print("\n-- Bulk Delete Users --")
+            ids_text = input("Comma-separated IDs (Enter to choose by filter instead): ").strip()
+            try:
+                filters = {"ids": [int(part) for part in ids_text.split(",")]} if ids_text else prompt_filters()
+            except ValueError:
+                print("IDs must be numbers.")
+                continue
+            if not filters:
+                print("Choose at least one filter.")
+                continue
+            filters["exclude_ids"] = [session.user["id"]]  # never delete yourself
+            matched = count_users(filters)
+            confirm = input(f"DELETE {matched} user(s)? (type 'DELETE' to confirm): ").strip()
+            if confirm == "DELETE":
+                try:
+                    print(f"Deleted {delete_users(filters=filters)} user(s).")
+                except ValueError as e:
+                    print(f"Error: {e}")
+            else:
+                print("Delete cancelled.")
+
+        elif choice == "stats":  # hidden: not listed in the menu
+            query_stats_menu()
+
         elif choice == "0":
+            session_store.revoke(token)
             print("Logging out...\n")
             break
         else:
             print("Invalid option.")
 
 
-def user_menu(logged_in_user: sqlite3.Row) -> None:
+def query_stats_menu() -> None:
+    """Hidden admin screen: show, toggle, reset or save the query stats."""
+    state = "on" if query_stats.enabled else "off"
+    print(f"\n-- Query Stats ({state}, slow log >= {query_stats.slow_ms:g} ms -> {query_stats.log_path}) --")
+    query_stats.report()
+    cache = user_cache.stats()
+    print(f"\nUser cache: {cache['size']}/{cache['max_size']} rows, ttl {cache['ttl']:g}s, "
+          f"{cache['hits']} hits / {cache['misses']} misses ({cache['hit_rate']:.1%}), "
+          f"{cache['evictions']} evictions, {cache['expirations']} expirations")
+    action = input("t) turn on/off  r) reset  j) save as JSON  (Enter to go back): ").strip().lower()
+    if action == "t":
+        if query_stats.enabled:
+            query_stats.disable()
+        else:
+            query_stats.enable()
+        print(f"Query stats are now {'on' if query_stats.enabled else 'off'}.")
+    elif action == "r":
+        query_stats.reset()
+        print("Stats cleared.")
+    elif action == "j":
+        path = input("File name [query_stats.json]: ").strip() or "query_stats.json"
+        query_stats.dump_json(path, user_cache=user_cache.stats())
+        print(f"Saved to {path}")
+
+
+def user_menu(token: str) -> None:
     """Display the normal user menu loop (view/update own profile, change password)."""
     while True:
+        session = current_session(token)
+        if session is None:
+            break
+        me = session.user
         print(f"""
-==== User Menu (you are: {logged_in_user['username']}) ====
+==== User Menu (you are: {me['username']}) ====
 1) View my profile
 2) Update my profile (name/email)
 3) Change my password
@@ -387,28 +2285,31 @@ def user_menu(logged_in_user: sqlite3.Row) -> None:
         choice = input("Choose an option: ").strip()
 
         if choice == "1":
-            me = read_user_by_id(logged_in_user["id"])
             print(f"\nID: {me['id']}\nUsername: {me['username']}\nFull name: {me['full_name']}\nEmail: {me['email']}\nRole: {me['role']}\nCreated: {me['created_at']}\n")
 
         elif choice == "2":
             full_name = prompt_nonempty("New full name (Enter to skip): ", allow_skip=True)
             email = prompt_nonempty("New email (Enter to skip): ", allow_skip=True)
             try:
-                update_user(logged_in_user["id"], full_name=full_name, email=email)
+                update_user(me["id"], full_name=full_name, email=email)
                 print("Profile updated.\n")
             except sqlite3.IntegrityError as e:
                 print(f"Error: {e}\n(Email must be unique.)")
 
         elif choice == "3":
+            user = read_user_by_id(me["id"], use_cache=False)
             old_pw = getpass.getpass("Current password: ").strip()
-            if not verify_password(old_pw, logged_in_user["salt"], logged_in_user["password_hash"]):
+            if user is None or not verify_password(old_pw, user["salt"], user["password_hash"]):
                 print("Current password incorrect.")
                 continue
             new_pw = getpass.getpass("New password: ").strip()
-            update_user(logged_in_user["id"], new_password=new_pw)
+            update_user(me["id"], new_password=new_pw)
+            # the change signed out every old session; the new one needs the new hash
+            token = session_store.create(read_user_by_id(me["id"], use_cache=False))
             print("Password changed.\n")
 
         elif choice == "0":
+            session_store.revoke(token)
             print("Logging out...\n")
             break
         else:
@@ -417,20 +2318,67 @@ def user_menu(logged_in_user: sqlite3.Row) -> None:
 
 # ---------- Main Program ----------
 
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    """Command-line options. With no sub-command the interactive menus start."""
+    parser = argparse.ArgumentParser(description="User CRUD database (CLI).")
+    commands = parser.add_subparsers(dest="command")
+
+    import_cmd = commands.add_parser("import", help="bulk-import users from a CSV or JSONL file")
+    import_cmd.add_argument("path", help="file with username, full_name, email, role, password")
+    import_cmd.add_argument("--batch-size", type=int, default=BULK_BATCH_SIZE,
+                            help=f"rows per transaction (default {BULK_BATCH_SIZE})")
+
+    changes_cmd = commands.add_parser("changes", help="print user changes after a sequence number as JSONL")
+    changes_cmd.add_argument("--after", type=int, default=0, help="last seq already applied (default 0 = all)")
+    changes_cmd.add_argument("--follow", action="store_true", help="keep running and print new changes")
+    changes_cmd.add_argument("--poll", type=float, default=1.0, help="seconds between checks with --follow")
+    changes_cmd.add_argument("--shard", type=int, help="sharded mode: which shard's log to read")
+
+    backup_cmd = commands.add_parser("backup", help="online backup of the database to a file")
+    backup_cmd.add_argument("dest", help="backup file to write (e.g. users-backup.db)")
+    backup_cmd.add_argument("--pages", type=int, default=BACKUP_PAGES_PER_STEP,
+                            help=f"pages copied per step (default {BACKUP_PAGES_PER_STEP})")
+
+    export_cmd = commands.add_parser("export", help="stream the users table to CSV/JSONL (optionally .gz)")
+    export_cmd.add_argument("path", help="e.g. users.csv, users.jsonl or users.jsonl.gz")
+    export_cmd.add_argument("--format", choices=("csv", "jsonl"), help="default: from the file name")
+
+    ask_cmd = commands.add_parser("ask", help="ask the (optional) assistant a question")
+    ask_cmd.add_argument("prompt")
+
+    return parser.parse_args(argv)
+
+
 def main() -> None:
     """Entry-point: initialize DB, then show login, then role-specific menus."""
+    args = parse_args()
+    if args.command == "import":
+        import_users_command(args.path, args.batch_size)
+        return
+    if args.command == "changes":
+        changes_command(args.after, args.follow, args.poll, args.shard)
+        return
+    if args.command == "backup":
+        backup_command(args.dest, args.pages)
+        return
+    if args.command == "export":
+        export_command(args.path, args.format)
+        return
+    if args.command == "ask":
+        ask_assistant(args.prompt)
+        return
+
     init_db()
     while True:
-        user = login()
-        if user is None:
+        token = login()
+        if token is None:
             continue
 
-        # Refresh row after login in case user was changed elsewhere
-        user = read_user_by_username(user["username"])
-        if user["role"] == "admin":
-            admin_menu()
+        session = session_store.get(token)
+        if session.user["role"] == "admin":
+            admin_menu(token)
         else:
-            user_menu(user)
+            user_menu(token)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Load test for user_crud_server.py
+=================================
+
+Opens N keep-alive connections and fires requests as fast as the server
+answers them, then prints requests/sec and latency percentiles.
+
+How to run
+----------
+1) Start the server:   python user_crud_server.py
+2) In another terminal: python user_crud_loadtest.py --clients 50 --seconds 10
+   (each client logs in as --username/--password first; reads need an admin)
+   Logins (scrypt checks) instead of reads:
+                        python user_crud_loadtest.py --mode login --password admin123
+   Session lookups (log in once per client, then GET /me with the token):
+                        python user_crud_loadtest.py --mode me --password admin123
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Tuple
+
+
+async def send(reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+               method: str, path: str, payload=None, token: str = "") -> Tuple[int, bytes]:
+    """Send one request on an open connection and return (status code, body)."""
+    body = b"" if payload is None else json.dumps(payload).encode("utf-8")
+    auth = f"Authorization: Bearer {token}\r\n" if token else ""
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: load\r\nContent-Type: application/json\r\n{auth}"
+        f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body
+    )
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    return status, await reader.readexactly(length) if length else b""
+
+
+async def client(args: argparse.Namespace, deadline: float, latencies: list[float], errors: list[int]) -> None:
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    credentials = {"username": args.username, "password": args.password}
+    try:
+        token = ""
+        if args.mode != "login":  # reads need a session too
+            status, body = await send(reader, writer, "POST", "/login", credentials)
+            if status != 200:
+                errors.append(status)
+                return
+            token = json.loads(body)["token"]
+
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            if args.mode == "login":
+                status, _ = await send(reader, writer, "POST", "/login", credentials)
+            elif args.mode == "me":
+                status, _ = await send(reader, writer, "GET", "/me", token=token)
+            else:
+                user_id = random.randint(1, args.max_id)
+                status, _ = await send(reader, writer, "GET", f"/users/{user_id}", token=token)
+            latencies.append(time.perf_counter() - start)
+            if status >= 500 or (args.mode != "read" and status != 200):
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def run(args: argparse.Namespace) -> None:
+    latencies: list[float] = []
+    errors: list[int] = []
+    start = time.perf_counter()
+    deadline = start + args.seconds
+    await asyncio.gather(*(client(args, deadline, latencies, errors) for _ in range(args.clients)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print(f"\n{args.mode}: {args.clients} concurrent clients for {elapsed:.1f}s")
+    print(f"  requests     : {len(latencies)}  (errors: {len(errors)})")
+    print(f"  requests/sec : {len(latencies) / elapsed:,.0f}")
+    for pct in (50, 95, 99):
+        print(f"  p{pct:<11}: {percentile(latencies, pct) * 1000:.2f} ms")
+    print()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load-test the user CRUD JSON server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--mode", choices=("read", "login", "me"), default="read")
+    parser.add_argument("--max-id", type=int, default=1000, help="read mode: pick ids from 1..max-id")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin123")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
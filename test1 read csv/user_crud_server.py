@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+User CRUD JSON Server
+=====================
+
+Headless mode for user_crud_cli.py: the same CRUD functions, exposed as a
+small JSON-over-HTTP API so many clients can work at the same time.
+
+How to run
+----------
+    python user_crud_server.py                 # listens on 127.0.0.1:8080
+    python user_crud_server.py --port 9000 --db-threads 16
+
+Endpoints
+---------
+Every endpoint except /login needs "Authorization: Bearer <token>" (from /login).
+
+    POST   /login            {"username", "password"}            -> user + "token"
+    GET    /me                                                    -> user
+    POST   /logout
+    POST   /users            {"username", "full_name", "email", "role", "password"}   admin
+    GET    /users            ?after_id=0&page_size=50&role=user   -> one page          admin
+    GET    /users/<id>                                            admin, or your own id
+    PATCH  /users/<id>       any of {"full_name", "email", "role", "password"}
+                                                                  admin, or your own id (not "role")
+    DELETE /users/<id>                                            admin
+    GET    /search           ?q=text&limit=20                     admin
+
+Same rules as the CLI menus: admins manage everyone, a user only sees and
+edits their own profile.
+
+Notes
+-----
+- One asyncio event loop handles every connection (HTTP/1.1 keep-alive).
+- Handlers run on a thread pool (each thread keeps its own pooled SQLite
+  connection) and login checks run on the hashing service's process pool,
+  so a slow query or an scrypt check never stalls the event loop.
+- Password hashes and salts are never included in responses.
+- /login checks the password once and returns a session token; /me answers
+  from the in-memory session store without touching the database.
+"""
+
+import argparse
+import asyncio
+import json
+import re
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import user_crud_cli as crud
+
+PUBLIC_FIELDS = ("id", "username", "full_name", "email", "role", "created_at")
+MAX_BODY_BYTES = 1024 * 1024
+
+STATUS_TEXT = {
+    200: "OK",
+    201: "Created",
+    204: "No Content",
+    400: "Bad Request",
+    401: "Unauthorized",
+    403: "Forbidden",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    409: "Conflict",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+}
+
+
+class HTTPError(Exception):
+    """Raised by handlers to send an error status with a JSON message."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def user_to_dict(row: Optional[sqlite3.Row]) -> Dict[str, Any]:
+    """Public view of a user row (no salt / password hash)."""
+    if row is None:
+        raise HTTPError(404, "User not found.")
+    return {field: row[field] for field in PUBLIC_FIELDS}
+
+
+def require(body: Dict[str, Any], *fields: str) -> None:
+    """Each field must be present as a non-empty string."""
+    missing = [field for field in fields if not body.get(field)]
+    if missing:
+        raise HTTPError(400, f"Missing field(s): {', '.join(missing)}")
+    optional_strings(body, *fields)
+
+
+def optional_strings(body: Dict[str, Any], *fields: str) -> None:
+    """Fields that are present (and not null) must be strings."""
+    wrong = [field for field in fields if body.get(field) is not None and not isinstance(body[field], str)]
+    if wrong:
+        raise HTTPError(400, f"Field(s) must be strings: {', '.join(wrong)}")
+
+
+# ---------- Handlers (run on the DB thread pool) ----------
+
+def handle_login(body: Dict[str, Any], query: Dict[str, str], token: Optional[str]) -> Tuple[int, Any]:
+    require(body, "username", "password")
+    user = crud.authenticate(body["username"], body["password"])
+    if user is None:
+        raise HTTPError(401, "Invalid username or password.")
+    return 200, dict(user_to_dict(user), token=crud.session_store.create(user))
+
+
+def count_param(query: Dict[str, str], name: str, default: int, maximum: int) -> int:
+    """A positive count from the query string, capped at `maximum`; 400 below 1."""
+    value = int(query.get(name, default))
+    if value < 1:
+        raise HTTPError(400, f"{name} must be at least 1.")
+    return min(value, maximum)
+
+
+def require_session(token: Optional[str], verify: bool = True) -> crud.Session:
+    """
+    The caller's session, or 401. verify=True re-reads the user's row so a
+    delete, password change or role change made by another process counts;
+    only /me and /logout skip it.
+    """
+    session = crud.verified_session(token) if verify else crud.session_store.get(token)
+    if session is None:
+        raise HTTPError(401, "Missing, invalid or expired session token.")
+    return session
+
+
+def require_admin(token: Optional[str]) -> crud.Session:
+    session = require_session(token)
+    if session.user["role"] != "admin":
+        raise HTTPError(403, "Admins only.")
+    return session
+
+
+def require_self_or_admin(token: Optional[str], user_id: int) -> crud.Session:
+    session = require_session(token)
+    if session.user["role"] != "admin" and session.user["id"] != user_id:
+        raise HTTPError(403, "You can only access your own profile.")
+    return session
+
+
+def handle_me(body: Dict[str, Any], query: Dict[str, str], token: Optional[str]) -> Tuple[int, Any]:
+    return 200, require_session(token, verify=False).user
+
+
+def handle_logout(body: Dict[str, Any], query: Dict[str, str], token: Optional[str]) -> Tuple[int, Any]:
+    crud.session_store.revoke(require_session(token, verify=False).token)
+    return 204, None
+
+
+def handle_create_user(body: Dict[str, Any], query: Dict[str, str], token: Optional[str]) -> Tuple[int, Any]:
+    require_admin(token)
+    require(body, "username", "full_name", "email", "role", "password")
+    new_id = crud.create_user(body["username"], body["full_name"], body["email"], body["role"], body["password"])
+    return 201, user_to_dict(crud.read_user_by_id(new_id))
+
+
+def handle_list_users(body: Dict[str, Any], query: Dict[str, str], token: Optional[str]) -> Tuple[int, Any]:
+    require_admin(token)
+    after_id = int(query.get("after_id", 0))
+    page_size = count_param(query, "page_size", 50, 1000)
+    filters = {key: query[key] for key in ("role", "created_after", "created_before") if key in query}
+
+    users = []
+    for row in crud.iter_users(after_id=after_id, page_size=page_size, filters=filters):
+        users.append(user_to_dict(row))
+        if len(users) == page_size:
+            break
+    next_after_id = users[-1]["id"] if len(users) == page_size else None
+    return 200, {"users": users, "next_after_id": next_after_id}
+
+
+def handle_read_user(body: Dict[str, Any], query: Dict[str, str], token: Optional[str], user_id: int) -> Tuple[int, Any]:
+    require_self_or_admin(token, user_id)
+    return 200, user_to_dict(crud.read_user_by_id(user_id))
+
+
+def handle_update_user(body: Dict[str, Any], query: Dict[str, str], token: Optional[str], user_id: int) -> Tuple[int, Any]:
+    session = require_self_or_admin(token, user_id)
+    optional_strings(body, "full_name", "email", "role", "password")
+    if body.get("role") is not None and session.user["role"] != "admin":
+        raise HTTPError(403, "Only admins can change roles.")
+    user_to_dict(crud.read_user_by_id(user_id))  # 404 if missing
+    crud.update_user(
+        user_id,
+        full_name=body.get("full_name"),
+        email=body.get("email"),
+        role=body.get("role"),
+        new_password=body.get("password"),
+    )
+    return 200, user_to_dict(crud.read_user_by_id(user_id))
+
+
+def handle_delete_user(body: Dict[str, Any], query: Dict[str, str], token: Optional[str], user_id: int) -> Tuple[int, Any]:
+    require_admin(token)
+    user_to_dict(crud.read_user_by_id(user_id))  # 404 if missing
+    crud.delete_user(user_id)
+    return 204, None
+
+
+def handle_search(body: Dict[str, Any], query: Dict[str, str], token: Optional[str]) -> Tuple[int, Any]:
+    require_admin(token)
+    require(query, "q")
+    limit = count_param(query, "limit", 20, 200)
+    return 200, {"users": [user_to_dict(row) for row in crud.search_users(query["q"], limit=limit)]}
+
+
+# (method, path pattern, handler). Handlers get (body, query, bearer token or
+# None); captured groups are passed after them as int arguments.
+ROUTES: list[Tuple[str, "re.Pattern[str]", Callable[..., Tuple[int, Any]]]] = [
+    ("POST", re.compile(r"^/login$"), handle_login),
+    ("GET", re.compile(r"^/me$"), handle_me),
+    ("POST", re.compile(r"^/logout$"), handle_logout),
+    ("POST", re.compile(r"^/users$"), handle_create_user),
+    ("GET", re.compile(r"^/users$"), handle_list_users),
+    ("GET", re.compile(r"^/users/(\d+)$"), handle_read_user),
+    ("PATCH", re.compile(r"^/users/(\d+)$"), handle_update_user),
+    ("DELETE", re.compile(r"^/users/(\d+)$"), handle_delete_user),
+    ("GET", re.compile(r"^/search$"), handle_search),
+]
+
+
+def dispatch(method: str, target: str, raw_body: bytes, authorization: str = "") -> Tuple[int, Any]:
+    """Route one request to its handler and turn exceptions into HTTP statuses."""
+    url = urlsplit(target)
+    scheme, _, token = authorization.partition(" ")
+    token = token.strip() if scheme.lower() == "bearer" else None
+    query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+    try:
+        body = json.loads(raw_body) if raw_body else {}
+        if not isinstance(body, dict):
+            raise HTTPError(400, "Request body must be a JSON object.")
+
+        path_matched = False
+        for route_method, pattern, handler in ROUTES:
+            match = pattern.match(url.path)
+            if match is None:
+                continue
+            path_matched = True
+            if route_method == method:
+                return handler(body, query, token, *(int(group) for group in match.groups()))
+        if path_matched:
+            raise HTTPError(405, f"{method} not allowed on {url.path}")
+        raise HTTPError(404, f"No route for {url.path}")
+
+    except HTTPError as e:
+        return e.status, {"error": e.message}
+    except json.JSONDecodeError:
+        return 400, {"error": "Request body is not valid JSON."}
+    except sqlite3.IntegrityError as e:
+        return 409, {"error": f"{e} (Username and Email must be unique.)"}
+    except ValueError as e:
+        return 400, {"error": str(e)}
+
+
+# ---------- HTTP plumbing (event loop) ----------
+
+class UserServer:
+    """Minimal HTTP/1.1 server: parses requests on the loop, runs handlers on executors."""
+
+    def __init__(self, db_threads: int):
+        self.db_executor = ThreadPoolExecutor(max_workers=db_threads, thread_name_prefix="user-db")
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+
+                headers: Dict[str, str] = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", "0"))
+                if length > MAX_BODY_BYTES:
+                    status, payload = 413, {"error": "Request body too large."}
+                    length = 0
+                    headers["connection"] = "close"
+                else:
+                    raw_body = await reader.readexactly(length) if length else b""
+                    try:
+                        status, payload = await loop.run_in_executor(
+                            self.db_executor, dispatch, method.upper(), target, raw_body,
+                            headers.get("authorization", ""),
+                        )
+                    except Exception as e:  # never let one bad request kill the connection loop
+                        status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                self.write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass  # client went away or sent garbage; just drop the connection
+        finally:
+            writer.close()
+
+    @staticmethod
+    def write_response(writer: asyncio.StreamWriter, status: int, payload: Any, keep_alive: bool) -> None:
+        body = b"" if payload is None else json.dumps(payload).encode("utf-8")
+        head = (
+            f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+            "\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+
+    async def serve(self, host: str, port: int) -> None:
+        server = await asyncio.start_server(self.handle_client, host, port, backlog=1024)
+        print(f"User CRUD server listening on http://{host}:{port}  (Ctrl+C to stop)")
+        async with server:
+            await server.serve_forever()
+
+    def close(self) -> None:
+        self.db_executor.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve the user CRUD database as a JSON API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--db-threads", type=int, default=8, help="threads for SQLite work")
+    args = parser.parse_args()
+
+    crud.init_db()
+    app = UserServer(db_threads=args.db_threads)
+    try:
+        asyncio.run(app.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("\nServer stopped.")
+    finally:
+        app.close()
+
+
+if __name__ == "__main__":
+    main()
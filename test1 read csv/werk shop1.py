@@ -6,6 +6,7 @@ import string
 import time
 import random
 from password_generator import password_game  
+import otp_store
 import subprocess
 #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # the code below is a phone number and verification code generator
@@ -13,26 +14,20 @@ def numbre(): # Number generation function
     """Generate a SA-style random phone number (10 digits, starting with 0)."""
     return "0" + ''.join(str(random.randint(0, 9)) for _ in range(9))# "0" + "".join() creates a string from the list of characters and str(random.randint(0, 9) for _ in range(9) is how many numbers you want to generate
 
-def generate_otp(length=5): # verification code generation function
-    """Generate a numeric OTP of given length."""
-    characters = string.ascii_uppercase + string.ascii_lowercase + string.digits
-    return ''.join(random.choice(characters) for _ in range(length)) #''.join() creates a string from the list of characters and random.choice(characters) for _ in range(length) is how many characters you want to generate
+# codes are kept in an in-memory store (otp_store.py): made with `secrets`, 4 tries, 120 seconds
+otps = otp_store.OtpStore(ttl=120, attempts=4, alphabet=string.ascii_uppercase + string.ascii_lowercase + string.digits)
 
-def verify_otp(expected_otp, attempts=4, ttl_seconds=120): # checking the verification code
+def generate_otp(phone, length=5): # verification code generation function
+    """Issue an OTP of given length for this phone number."""
+    return otps.issue(phone, length=length) # secrets.choice() picks each character, so the code can't be guessed from earlier ones
+
+def verify_otp(phone): # checking the verification code
     """
-    Prompt the user to enter the OTP.
-    - attempts: how many tries are allowed
-    - ttl_seconds: how long the OTP is valid
+    Prompt the user to enter the OTP sent to `phone`.
+    Tries left and expiry are tracked by the OTP store.
     Returns True if verified, False otherwise.
     """
-    start_time = time.time()
-
-    while attempts > 0:
-        # Check expiry before asking again
-        if time.time() - start_time > ttl_seconds:
-            print("⏰ The code expired. Please request a new one.")
-            return False
-
+    while True:
         entered = input("Enter the 4-digit verification code: ").strip()
 
         # Optional: also allow the user to quit early
@@ -40,17 +35,19 @@ def verify_otp(expected_otp, attempts=4, ttl_seconds=120): # checking the verifi
             print("Exited verification.")
             return False
 
-        if entered == expected_otp:
+        result = otps.check(phone, entered)
+        if result == otp_store.OK:
             print("✅ Verified! Welcome aboard.")
             return True
-
-        attempts -= 1
-        # Show how many attempts are left
-        if attempts > 0:
-            print(f"❌ Incorrect. {attempts} attempt(s) left.")
+        if result == otp_store.EXPIRED:
+            print("⏰ The code expired. Please request a new one.")
+            return False
+        if result == otp_store.WRONG:
+            # Show how many attempts are left
+            print(f"❌ Incorrect. {otps.tries_left(phone)} attempt(s) left.")
         else:
             print("🚫 Verification failed. No attempts left.")
-    return False
+            return False
 
 def clear():
      """Clear the console screen."""
@@ -85,11 +82,11 @@ def main():
     print("Your saved random number is:", saved_number)
 
     # 3) "Send" a 4-digit OTP (for real apps, send via SMS/email)
-    otp = generate_otp(4)
+    otp = generate_otp(saved_number, 4)
     print(f"(DEBUG) Verification code sent to: {otp}")
 
     # 4) Verify user input
-    verified = verify_otp(otp, attempts=4, ttl_seconds=120)
+    verified = verify_otp(saved_number)
 
     # If not verified → stop program
     if not verified: